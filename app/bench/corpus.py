@@ -0,0 +1,187 @@
+import csv
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+
+FILE_TYPES = ("txt", "pdf", "docx", "pptx", "csv", "xlsx", "png")
+
+_SYLLABLES = ("ka", "lo", "mi", "ren", "tas", "vel", "qu", "dor", "pex", "sul", "ni", "bra", "tor", "gem", "fa", "zu")
+_COMMON = ("the", "and", "for", "with", "report", "project", "data", "team", "plan", "review")
+
+
+def _vocab(rng: random.Random, n: int = 3000) -> List[str]:
+    words = set()
+    while len(words) < n:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _sentence(rng: random.Random, vocab: List[str], topic: List[str]) -> str:
+    words = [
+        rng.choice(topic) if rng.random() < 0.3 else
+        rng.choice(_COMMON) if rng.random() < 0.3 else rng.choice(vocab)
+        for _ in range(rng.randint(8, 16))
+    ]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraphs(rng, vocab, topic, n_words: int) -> List[str]:
+    paras, total = [], 0
+    while total < n_words:
+        para = " ".join(_sentence(rng, vocab, topic) for _ in range(rng.randint(3, 6)))
+        paras.append(para)
+        total += len(para.split())
+    return paras
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, lines: List[str], per_page: int = 50):
+    # Minimal text-only PDF (Helvetica, one text object per page) that pdfminer can read
+    pages = [lines[i:i+per_page] for i in range(0, len(lines), per_page)] or [[]]
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        body = "BT /F1 9 Tf 40 800 Td 12 TL " + " ".join(f"({_pdf_escape(l)}) '" for l in page) + " ET"
+        objects.append(f"<< /Length {len(body.encode('latin-1'))} >>\nstream\n{body}\nendstream")
+        content = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    path.write_bytes(bytes(out))
+
+
+def _wrap(paras: List[str], width: int = 100) -> List[str]:
+    lines = []
+    for para in paras:
+        line = ""
+        for w in para.split():
+            if len(line) + len(w) + 1 > width:
+                lines.append(line)
+                line = w
+            else:
+                line = f"{line} {w}".strip()
+        lines.append(line)
+    return lines
+
+
+def _write(path: Path, ext: str, paras: List[str], rng: random.Random):
+    if ext == "txt":
+        path.write_text("\n\n".join(paras), encoding="utf-8")
+    elif ext == "pdf":
+        write_pdf(path, _wrap(paras))
+    elif ext == "docx":
+        from docx import Document
+        doc = Document()
+        for para in paras:
+            doc.add_paragraph(para)
+        doc.save(str(path))
+    elif ext == "pptx":
+        from pptx import Presentation
+        prs = Presentation()
+        for para in paras:
+            slide = prs.slides.add_slide(prs.slide_layouts[1])
+            slide.shapes.title.text = " ".join(para.split()[:4])
+            slide.placeholders[1].text = para
+        prs.save(str(path))
+    elif ext in {"csv", "xlsx"}:
+        rows = [["id", "name", "notes"]] + [
+            [str(i), " ".join(s.split()[:2]), s] for i, s in enumerate(p for para in paras for p in para.split(". "))
+        ]
+        if ext == "csv":
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerows(rows)
+        else:
+            from openpyxl import Workbook
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet("data")
+            for row in rows:
+                ws.append(row)
+            wb.save(str(path))
+
+
+def _write_png(path: Path, rng: random.Random, icon: bool = False):
+    from PIL import Image, ImageDraw
+
+    size = (16, 16) if icon else (640, 480)
+    img = Image.new("RGB", size, tuple(rng.randint(0, 255) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(0 if icon else rng.randint(3, 12)):
+        x0, y0 = rng.randint(0, size[0] - 2), rng.randint(0, size[1] - 2)
+        x1, y1 = rng.randint(x0 + 1, size[0]), rng.randint(y0 + 1, size[1])
+        draw.rectangle([x0, y0, x1, y1], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    img.save(str(path))
+
+
+# Reproducible mixed-format corpus plus known-item queries (query -> file it came from)
+def make_corpus(root: Path, scale: int = 10, seed: int = 0, words: int = 1500) -> Dict:
+    rng = random.Random(seed)
+    vocab = _vocab(rng)
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+
+    files, queries = [], []
+    for ext in FILE_TYPES:
+        sub = root / ext
+        sub.mkdir(exist_ok=True)
+        for i in range(scale):
+            path = sub / f"{ext}_{seed}_{i:05d}.{ext}"
+            if ext == "png":
+                _write_png(path, rng, icon=(i % 10 == 9))
+                files.append(str(path))
+                continue
+
+            topic = rng.sample(vocab, 12)
+            paras = _paragraphs(rng, vocab, topic, rng.randint(words // 2, words * 3 // 2))
+            _write(path, ext, paras, rng)
+            files.append(str(path))
+
+            # Queries come from the first part of the file so every extraction budget keeps them
+            sentence = rng.choice(paras[0].split(". "))
+            queries.append({"query": " ".join(sentence.split()[:10]), "path": str(path)})
+
+    manifest = {"seed": seed, "scale": scale, "words": words, "files": files, "queries": queries}
+    (root.parent / f"{root.name}.json").write_text(json.dumps(manifest, indent=1))
+    return manifest
+
+
+def mutate_corpus(manifest: Dict, fraction: float = 0.1, seed: int = 1) -> Dict:
+    # Modify / add / delete a fraction of the text files for a delta sync
+    rng = random.Random(seed)
+    vocab = _vocab(random.Random(manifest["seed"]))
+    texts = [Path(f) for f in manifest["files"] if Path(f).suffix == ".txt" and Path(f).exists()]
+    if not texts:
+        return {"modified": 0, "deleted": 0, "added": 0}
+    n = max(1, int(len(texts) * fraction))
+    picked = rng.sample(texts, min(len(texts), 2 * n))
+    modified, deleted = picked[:n], picked[n:]
+
+    for path in modified:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n\n" + " ".join(_sentence(rng, vocab, rng.sample(vocab, 12)) for _ in range(20)))
+    for path in deleted:
+        path.unlink()
+
+    added = []
+    for i in range(n):
+        path = texts[0].parent / f"txt_added_{seed}_{i:05d}.txt"
+        path.write_text("\n\n".join(_paragraphs(rng, vocab, rng.sample(vocab, 12), manifest["words"])), encoding="utf-8")
+        added.append(str(path))
+
+    return {"modified": len(modified), "deleted": len(deleted), "added": len(added)}
@@ -0,0 +1,341 @@
+"""
+Offline benchmark: synthetic corpus -> build_index -> delta sync -> queries
+
+    python -m app.bench.run --scale 20 --stub --out bench.json
+    python -m app.bench.run --scale 20 --stub --baseline bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+from app.utils import profile
+from app.utils.timing import rss_mb
+
+# Metrics whose name contains one of these are better when higher; all others when lower
+HIGHER_IS_BETTER = ("per_s", "recall", "hit_rate")
+# Smallest absolute change that counts, by metric suffix: below this, memory and
+# short timings are run-to-run jitter however large the relative change
+NOISE_FLOOR = (("_mb", 20.0), ("seconds", 0.05), ("_ms", 1.0))
+
+
+def pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def latency_stats(ms: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": pct(ms, 50),
+        "p95_ms": pct(ms, 95),
+        "p99_ms": pct(ms, 99),
+        "mean_ms": sum(ms) / len(ms) if ms else 0.0,
+    }
+
+
+@contextmanager
+def peak_rss(out: Dict):
+    # Samples resident memory in the background; out["peak_rss_mb"] after the block
+    peak = [rss_mb()]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.05):
+            peak[0] = max(peak[0], rss_mb())
+
+    t = threading.Thread(target=sample, daemon=True)
+    t.start()
+    try:
+        yield
+    finally:
+        done.set()
+        t.join()
+        out["peak_rss_mb"] = max(peak[0], rss_mb())
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parents[2],
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def bench_build(corpus: Path, name: str, n_files: int, workers: int, index_type: str) -> Dict:
+    from app.indexing.builder import build_index
+    from app.indexing.rowstore import open_rows
+
+    res: Dict = {}
+    with peak_rss(res):
+        t = time.perf_counter()
+        build_index(str(corpus), name, workers=workers, index_type=index_type)
+        secs = time.perf_counter() - t
+
+    rows = open_rows(name)
+    chunks = rows.count()
+    rows.close()
+    res.update(
+        {
+            "seconds": secs,
+            "files": n_files,
+            "chunks": chunks,
+            "files_per_s": n_files / secs,
+            "chunks_per_s": chunks / secs,
+        }
+    )
+    return res
+
+
+def bench_delta(corpus: Path, name: str, manifest: Dict) -> Dict:
+    from app.bench.corpus import mutate_corpus
+    from app.core.models import LazyEmbeddings
+    from app.indexing.delta import DeltaIndexer
+
+    changes = mutate_corpus(manifest)
+    db_dir = Path("vector_dbs") / f"{name}_bge_db"
+
+    res: Dict = {"changes": changes}
+    with peak_rss(res):
+        t = time.perf_counter()
+        handler = DeltaIndexer(str(corpus), name, LazyEmbeddings(), db_dir)
+        res["load_seconds"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        added, modified, deleted = handler.sync()
+        secs = time.perf_counter() - t
+
+    n = added + modified + deleted
+    res.update({"seconds": secs, "files": n, "files_per_s": n / secs if secs else 0.0})
+    handler.rows.close()
+    return res
+
+
+def bench_queries(name: str, queries: List[Dict], k: int, answers: int, mmap: bool) -> Dict:
+    # The chat retrieval path: load_store + hybrid_search, then (optionally) the answer step
+    from app.core.models import get_query_embeddings
+    from app.indexing.loader import load_store
+    from app.indexing.rowstore import open_rows
+    from app.indexing.txn import index_version
+    from app.rag.answer import generate_answer_with_llm
+    from app.rag.answer_cache import AnswerCache
+    from app.rag.llm import init_llm
+    from app.rag.retrieval import hybrid_search
+
+    db_dir = Path("vector_dbs") / f"{name}_bge_db"
+    res: Dict = {}
+    with peak_rss(res):
+        embeddings = get_query_embeddings()
+        t = time.perf_counter()
+        vectordb = load_store(db_dir, embeddings, mmap=mmap)
+        res["load_seconds"] = time.perf_counter() - t
+        lexical = open_rows(name).lexical
+
+        hits_by_query = []
+        for label in ("cold", "warm"):
+            ms, found = [], 0
+            t0 = time.perf_counter()
+            for q in queries:
+                t = time.perf_counter()
+                hits = hybrid_search(vectordb, lexical, q["query"], k=k)
+                ms.append((time.perf_counter() - t) * 1000)
+                found += any(d.metadata.get("path") == q["path"] for d, _ in hits)
+                if label == "cold":
+                    hits_by_query.append(hits)
+            res[label] = {
+                **latency_stats(ms),
+                "queries_per_s": len(queries) / (time.perf_counter() - t0),
+                f"recall@{k}": found / len(queries) if queries else 0.0,
+            }
+
+        llm = init_llm() if answers else None
+        if llm:
+            cache = AnswerCache()
+            version = index_version(db_dir)
+            ms = []
+            for q, hits in list(zip(queries, hits_by_query))[:answers]:
+                if not hits:
+                    continue
+                t = time.perf_counter()
+                generate_answer_with_llm(llm, q["query"], hits[:5], cache=cache, version=version)
+                ms.append((time.perf_counter() - t) * 1000)
+            res["answer"] = latency_stats(ms)
+
+    if hasattr(embeddings, "hit_rate"):
+        res["query_cache_hit_rate"] = embeddings.hit_rate()
+    return res
+
+
+def bench_batch(name: str, queries: List[Dict], k: int, mmap: bool) -> Dict:
+    # main.py --queries end to end: the query file (plus lines it must tolerate) -> JSONL
+    from app.rag.batch_query import run_batch
+
+    qfile, out = Path("bench_queries.jsonl"), Path("bench_results.jsonl")
+    lines = [json.dumps({"id": i, "query": q["query"]}) for i, q in enumerate(queries)]
+    lines += ['{"id": "no-query"}', "{not json"]
+    qfile.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    res: Dict = {}
+    with peak_rss(res):
+        summary = run_batch(str(qfile), str(out), name=name, k=k, mmap=mmap)
+
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    # Malformed JSON lines are searched as plain text, so every line comes back
+    expected = len(queries) + 2
+    if summary is None or len(records) != expected:
+        raise RuntimeError(f"batch query mode wrote {len(records)} records, expected {expected}")
+    by_id = {r["id"]: r for r in records}
+    found = sum(
+        any(hit["path"] == q["path"] for hit in by_id[i]["results"])
+        for i, q in enumerate(queries)
+    )
+    res.update(
+        {
+            "queries_per_s": summary["queries_per_s"],
+            "search_ms": summary["search_ms"],
+            f"recall@{k}": found / len(queries) if queries else 0.0,
+        }
+    )
+    return res
+
+
+def _flatten(d: Dict, prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    # Prints every shared metric; returns the ones that got worse by more than `tolerance`
+    cur = _flatten({k: current[k] for k in ("build", "delta", "query", "batch") if k in current})
+    base = _flatten({k: baseline[k] for k in ("build", "delta", "query", "batch") if k in baseline})
+
+    regressions = []
+    print(f"\n📊 vs baseline ({baseline.get('meta', {}).get('commit', '?')}):")
+    for key in sorted(set(cur) & set(base)):
+        if key.endswith(("files", "chunks")) or ".changes." in key:
+            continue
+        a, b = cur[key], base[key]
+        if b == 0:
+            continue
+        change = (a - b) / abs(b)
+        higher = any(tag in key for tag in HIGHER_IS_BETTER)
+        worse = -change if higher else change
+        floor = next((v for suffix, v in NOISE_FLOOR if key.endswith(suffix)), 0.0)
+        flag = ""
+        if abs(a - b) <= floor:
+            pass
+        elif worse > tolerance:
+            flag = "  ❌ regression"
+            regressions.append(key)
+        elif worse < -tolerance:
+            flag = "  ✅ faster" if not higher else "  ✅ better"
+        print(f"   {key:<36} {b:12.3f} -> {a:12.3f}  ({change:+.1%}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="IntelliSearch offline benchmark")
+    parser.add_argument("--scale", type=int, default=10, help="Files per type in the synthetic corpus")
+    parser.add_argument("--words", type=int, default=1500, help="Average words per text file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub", action="store_true", help="Deterministic stand-ins for bge / BART / BLIP / Ollama")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--mmap", action="store_true")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--answers", type=int, default=20, help="Queries also answered through the LLM (0 = skip)")
+    parser.add_argument("--workdir", default=None, help="Keep corpus / index here (default: temp dir)")
+    parser.add_argument("--out", default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", default=None, help="Compare against this results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown before flagging")
+    parser.add_argument("--profile", action="store_true", help="Add per-stage timers / counters to the results")
+    args = parser.parse_args(argv)
+
+    out_path = Path(args.out).resolve() if args.out else None
+    baseline_path = Path(args.baseline).resolve() if args.baseline else None
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="intellisearch-bench-")).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    # Indexes and caches are written relative to the working directory
+    os.chdir(workdir)
+
+    if args.profile:
+        profile.enable()
+
+    if args.stub:
+        from app.bench.stubs import install_stubs
+        install_stubs()
+
+    from app.bench.corpus import make_corpus
+
+    corpus = workdir / "corpus"
+    shutil.rmtree(corpus, ignore_errors=True)
+    for d in ("vector_dbs", "file_indexes", "cache"):
+        shutil.rmtree(workdir / d, ignore_errors=True)
+
+    t = time.perf_counter()
+    manifest = make_corpus(corpus, scale=args.scale, seed=args.seed, words=args.words)
+    print(f"-> Corpus: {len(manifest['files'])} files in {time.perf_counter() - t:.1f}s ({corpus})")
+
+    name = corpus.name
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "stub": args.stub,
+            "scale": args.scale,
+            "words": args.words,
+            "seed": args.seed,
+            "index_type": args.index_type,
+        }
+    }
+    results["build"] = bench_build(corpus, name, len(manifest["files"]), args.workers, args.index_type)
+    results["delta"] = bench_delta(corpus, name, manifest)
+    results["query"] = bench_queries(name, manifest["queries"], args.k, args.answers, args.mmap)
+    results["batch"] = bench_batch(name, manifest["queries"], args.k, args.mmap)
+    if args.profile:
+        results["profile"] = profile.summary()
+
+    print(json.dumps(results, indent=2))
+    if out_path:
+        out_path.write_text(json.dumps(results, indent=2))
+        print(f"-> Results written to {out_path}")
+
+    if baseline_path:
+        regressions = compare(results, json.loads(baseline_path.read_text()), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+    if not args.workdir:
+        os.chdir(tempfile.gettempdir())
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
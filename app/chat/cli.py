@@ -1,21 +1,31 @@
 import os
 import sys
-import json
 import re
 import subprocess
 import time
 from pathlib import Path
 from typing import List
 
-from langchain_community.vectorstores import FAISS
-
 from app.rag.llm import init_llm
-from app.rag.answer import generate_answer_with_llm
-from app.utils.misc import looks_like_gibberish
-from app.core.models import load_embeddings
-
-
-def chat(name: str, embeddings_obj=None):
+from app.rag.answer import stream_answer_with_llm
+from app.rag.answer_cache import get_answer_cache
+from app.rag.retrieval import hybrid_search
+from app.rag.federated import FederatedSearch, list_indexes
+from app.core.models import get_query_embeddings
+from app.indexing.loader import load_store
+from app.indexing.rowstore import open_rows, rows_path
+from app.indexing.txn import index_version
+from app.utils.timing import timed, startup_report
+from app.utils import profile
+
+
+def chat(
+    name: str,
+    embeddings_obj=None,
+    nprobe: int = None,
+    ef_search: int = None,
+    mmap: bool = False,
+):
     db_dir = Path("vector_dbs") / f"{name}_bge_db"
     if not db_dir.exists():
         sys.exit(f"Index '{name}' not found. Run index mode first.")
@@ -24,17 +34,64 @@ def chat(name: str, embeddings_obj=None):
     if age_hours > 12:
         print(f"DB is {age_hours:.1f}h old – re-index if files changed.")
 
-    embeddings = embeddings_obj or load_embeddings()
-    vectordb = FAISS.load_local(
-        str(db_dir),
-        embeddings,
-        allow_dangerous_deserialization=True,
-    )
-
+    embeddings = embeddings_obj or get_query_embeddings()
+    with timed("load index"):
+        vectordb = load_store(
+            db_dir,
+            embeddings,
+            mmap=mmap,
+            nprobe=nprobe,
+            ef_search=ef_search,
+        )
+    lexical = open_rows(name).lexical
+
+    def search(query: str, k: int):
+        return hybrid_search(vectordb, lexical, query, k=k)
+
+    _chat_loop(search, index_version(db_dir))
+    _report_embeddings(embeddings)
+
+
+# One question across several indexes (all built indexes by default)
+def chat_federated(
+    names: List[str] = None,
+    nprobe: int = None,
+    ef_search: int = None,
+    mmap: bool = True,
+):
+    names = names or list_indexes()
+    missing = [n for n in names if not rows_path(n).exists()]
+    if missing or not names:
+        sys.exit(f"Index not found: {', '.join(missing) or 'none built yet'}. Run index mode first.")
+
+    embeddings = get_query_embeddings()
+    fed = FederatedSearch(names, embeddings, mmap=mmap, nprobe=nprobe, ef_search=ef_search)
+    with timed("load indexes"):
+        # Warms up as many indexes as fit under the memory cap
+        list(fed.pool.map(fed.shard, names))
+    print(f"-> Searching {len(names)} indexes: {', '.join(names)}")
+
+    try:
+        _chat_loop(fed.search, fed.version())
+    finally:
+        fed.report()
+        fed.close()
+    _report_embeddings(embeddings)
+
+
+def _report_embeddings(embeddings):
+    if hasattr(embeddings, "report"):
+        embeddings.report()
+        profile.count("query_cache.hits", embeddings.hits)
+        profile.count("query_cache.misses", embeddings.misses)
+
+
+def _chat_loop(search, version: str):
     llm = init_llm()
-    rows = json.loads(Path("file_indexes", f"{name}.json").read_text())
+    answers = get_answer_cache()
 
     last_paths: List[str] = []
+    startup_report()
 
     print("Ask me anything (type 'exit' to quit)")
     while True:
@@ -53,8 +110,7 @@ def chat(name: str, embeddings_obj=None):
         )
         if m:
             term = m.group(1).strip()
-            hits = vectordb.similarity_search_with_score(term, k=5)
-            hits = [(d, s) for d, s in hits if s >= 0.3]
+            hits = search(term, 5)
 
             if not hits:
                 print("No file found.")
@@ -74,8 +130,9 @@ def chat(name: str, embeddings_obj=None):
             continue
 
         
-        hits = vectordb.similarity_search_with_score(q, k=10)
-        hits = [(d, s) for d, s in hits if s >= 0.3]
+        with profile.stage("query.search"):
+            hits = search(q, 10)
+        profile.count("query.count")
 
         if not hits:
             print("No relevant docs.")
@@ -84,12 +141,21 @@ def chat(name: str, embeddings_obj=None):
         last_paths = [d.metadata.get("path") for d, _ in hits]
 
         if llm:
+            # Tokens are printed as they arrive; Ctrl+C stops the answer, not the chat
+            stream = stream_answer_with_llm(
+                llm, q, hits[:5], cache=answers, version=version
+            )
+            print("\n🧠 ", end="", flush=True)
             try:
-                ans = generate_answer_with_llm(llm, q, hits[:5])
-                if looks_like_gibberish(ans):
-                    raise RuntimeError
-                print("\n🧠", ans)
+                for piece in stream:
+                    print(piece, end="", flush=True)
+                print()
+            except KeyboardInterrupt:
+                stream.close()
+                print("\n(stopped)")
             except Exception:
+                stream.close()
+                print("\n(answer discarded)")
                 print("\nTop results:")
                 for d, s in hits[:5]:
                     print("•", d.metadata.get("path"), f"(score {s:.2f})")
@@ -1,15 +1,20 @@
 import os
 import sys
-import json
+import queue
 import subprocess
+import threading
 from pathlib import Path
 
-from langchain_community.vectorstores import FAISS
-
 from app.rag.llm import init_llm
-from app.rag.answer import generate_answer_with_llm
-from app.utils.misc import looks_like_gibberish
-from app.core.models import load_embeddings
+from app.rag.answer import stream_answer_with_llm
+from app.rag.answer_cache import get_answer_cache
+from app.rag.retrieval import hybrid_search
+from app.core.models import get_query_embeddings
+from app.indexing.loader import load_store
+from app.indexing.txn import index_version
+from app.indexing.rowstore import open_rows
+from app.utils.timing import timed, startup_report
+from app.utils import profile
 
 try:
     import tkinter as tk
@@ -31,12 +36,16 @@ def _open_path_in_explorer(path: str):
 
 
 class SmartSearchUI:
-    def __init__(self, root, vectordb, rows):
+    def __init__(self, root, vectordb, rows, version: str = None):
         self.root = root
         self.vectordb = vectordb
         self.rows = rows
+        self.version = version
+        self.answers = get_answer_cache()
         self.last_hits = []
         self.llm = None
+        self._stream = None
+        self._cancel = threading.Event()
 
         self.root.title("🧠 Smart File Search (GUI)")
         self.root.geometry("920x700")
@@ -74,6 +83,13 @@ class SmartSearchUI:
             command=self.send_query
         ).pack(side=tk.RIGHT)
 
+        tk.Button(
+            bottom,
+            text="Stop",
+            width=8,
+            command=self.stop_answer
+        ).pack(side=tk.RIGHT, padx=(0, 6))
+
         # Results
         self.results_frame = tk.LabelFrame(
             root,
@@ -83,8 +99,15 @@ class SmartSearchUI:
         self.results_frame.pack(padx=10, pady=(0, 10), fill=tk.X)
 
     def add_message(self, who, text):
+        self.begin_message(who)
+        self.append_text(f"{text}\n\n")
+
+    def begin_message(self, who):
+        self.append_text(f"{who}: ")
+
+    def append_text(self, text):
         self.chat_box.configure(state="normal")
-        self.chat_box.insert(tk.END, f"{who}: {text}\n\n")
+        self.chat_box.insert(tk.END, text)
         self.chat_box.configure(state="disabled")
         self.chat_box.yview(tk.END)
 
@@ -120,10 +143,12 @@ class SmartSearchUI:
             return
 
         self.entry.delete(0, tk.END)
+        self.stop_answer()
         self.add_message("You", q)
 
-        hits = self.vectordb.similarity_search_with_score(q, k=5)
-        hits = [(d, s) for d, s in hits if s >= 0.3]
+        with profile.stage("query.search"):
+            hits = hybrid_search(self.vectordb, self.rows.lexical, q, k=5)
+        profile.count("query.count")
 
         if not hits:
             self.add_message("Bot", "No relevant files found.")
@@ -131,28 +156,71 @@ class SmartSearchUI:
             return
 
         self.last_hits = hits[:3]
+        self.show_results()
 
         if self.llm is None:
             self.llm = init_llm()
 
-        answer = None
-        if self.llm:
+        if not self.llm:
+            self.add_message("Bot", "Here are the most relevant files:")
+            return
+
+        # The answer streams in from a worker thread; the Tk loop polls for pieces
+        out = queue.Queue()
+        self._stream = out
+        self._cancel = threading.Event()
+        self.begin_message("Bot")
+        threading.Thread(
+            target=self._run_stream,
+            args=(q, self.last_hits, self._cancel, out),
+            daemon=True,
+        ).start()
+        self.root.after(50, self._poll_stream, out)
+
+    def _run_stream(self, q, hits, cancel, out):
+        stream = stream_answer_with_llm(
+            self.llm, q, hits, cache=self.answers, version=self.version
+        )
+        try:
+            for piece in stream:
+                if cancel.is_set():
+                    break
+                out.put(("piece", piece))
+            out.put(("done", None))
+        except Exception as e:
+            out.put(("error", e))
+        finally:
+            stream.close()
+
+    def _poll_stream(self, out):
+        if out is not self._stream:
+            return
+
+        while True:
             try:
-                answer = generate_answer_with_llm(self.llm, q, self.last_hits)
-                if looks_like_gibberish(answer):
-                    answer = None
-            except Exception:
-                answer = None
-
-        if answer:
-            self.add_message("Bot", answer)
-        else:
-            self.add_message(
-                "Bot",
-                "Here are the most relevant files:"
-            )
+                kind, value = out.get_nowait()
+            except queue.Empty:
+                break
 
-        
+            if kind == "piece":
+                self.append_text(value)
+                continue
+            if kind == "error":
+                self.append_text("\n(answer discarded) Here are the most relevant files:")
+            self.append_text("\n\n")
+            self._stream = None
+            return
+
+        self.root.after(50, self._poll_stream, out)
+
+    def stop_answer(self):
+        if self._stream is None:
+            return
+        self._cancel.set()
+        self._stream = None
+        self.append_text(" (stopped)\n\n")
+
+    def show_results(self):
         self.clear_results()
         for d, s in self.last_hits:
             path = d.metadata.get("path")
@@ -183,23 +251,36 @@ class SmartSearchUI:
             ).pack(side=tk.RIGHT)
 
 
-def launch_gui(name: str):
+def launch_gui(
+    name: str,
+    nprobe: int = None,
+    ef_search: int = None,
+    mmap: bool = False,
+):
     if tk is None:
         print("tkinter not available.")
         return
 
     db_dir = Path("vector_dbs") / f"{name}_bge_db"
-    idx_file = Path("file_indexes", f"{name}.json")
 
-    embeddings = load_embeddings()
-    vectordb = FAISS.load_local(
-        str(db_dir),
-        embeddings,
-        allow_dangerous_deserialization=True,
-    )
+    embeddings = get_query_embeddings()
+    with timed("load index"):
+        vectordb = load_store(
+            db_dir,
+            embeddings,
+            mmap=mmap,
+            nprobe=nprobe,
+            ef_search=ef_search,
+        )
 
-    rows = json.loads(idx_file.read_text())
+    # Row metadata is queried on demand instead of being loaded up front
+    rows = open_rows(name)
+    startup_report()
 
     root = tk.Tk()
-    SmartSearchUI(root, vectordb, rows)
+    SmartSearchUI(root, vectordb, rows, version=index_version(db_dir))
     root.mainloop()
+    if hasattr(embeddings, "report"):
+        embeddings.report()
+        profile.count("query_cache.hits", embeddings.hits)
+        profile.count("query_cache.misses", embeddings.misses)
@@ -1,3 +1,5 @@
+import os
+
 #Supported file types
 SUPPORTED_TEXT = {"pdf","txt","docx","pptx","csv","xls","xlsx","py","java"}
 SUPPORTED_IMG  = {"png","jpg","jpeg"}
@@ -12,3 +14,114 @@ SUMMARIZER    = "facebook/bart-large-cnn"
 TAG_MAX       = 5
 CHUNK_WORDS   = 512
 CHUNK_OVERLAP = 64
+SUMMARY_BATCH = 8
+EMBED_BATCH   = 256
+IMAGE_BATCH   = 64
+
+#Parallel extraction
+EXTRACT_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+EXTRACT_TIMEOUT = 120
+
+#Extraction budget: characters kept per file (extraction stops once reached)
+EXTRACT_BUDGET = {
+    "default": 30000,
+    "pdf":     30000,
+    "docx":    30000,
+    "pptx":    30000,
+    "csv":     30000,
+    "xlsx":    30000,
+    "txt":     30000,
+    "py":      30000,
+    "java":    30000,
+}
+PDF_MAX_PAGES  = 50
+CSV_CHUNK_ROWS = 2000
+
+#ANN index (flat | ivf | ivfpq | hnsw)
+ANN_INDEX        = "flat"
+ANN_MIN_VECTORS  = 10000
+ANN_TRAIN_SAMPLE = 100000
+ANN_PQ_M         = 64
+ANN_HNSW_M       = 32
+ANN_NPROBE       = 16
+ANN_EF_SEARCH    = 64
+ANN_TOMBSTONE_MAX = 0.2  # HNSW: rebuild once this fraction of vectors is deleted
+
+#Content cache
+CACHE_DIR     = "cache"
+CACHE_MAX_MB  = 4096
+
+#Query embedding cache
+QUERY_CACHE_SIZE    = 4096
+QUERY_CACHE_PERSIST = True
+
+#Answer cache
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL  = 3600
+
+#Live watch mode
+WATCH_DEBOUNCE  = 2.0
+WATCH_INTERVAL  = 1.0
+WATCH_BATCH_MAX = 500
+WATCH_QUEUE_MAX = 10000
+WATCH_RETRY_DELAY = 2.0   # doubled per failed attempt
+WATCH_RETRY_MAX   = 300.0
+WATCH_RETRY_LIMIT = 8
+
+#Hybrid search
+HYBRID_SEARCH  = True
+RRF_K          = 60
+BM25_K1        = 1.2
+BM25_B         = 0.75
+LEXICAL_MAX_DF = 0.05  # skip query terms found in more than this fraction of chunks
+
+#LLM streaming
+LLM_MAX_TOKENS        = 256
+GIBBERISH_CHECK_CHARS = 80
+
+#Web service
+WEB_INDEX           = os.environ.get("INTELLISEARCH_INDEX", "")
+WEB_MMAP            = os.environ.get("INTELLISEARCH_MMAP", "1") == "1"
+WEB_SEARCH_WORKERS  = 32  # mostly waiting on the query batcher
+WEB_LLM_CONCURRENCY = 2
+WEB_LLM_TIMEOUT     = 60
+WEB_TOP_K           = 5
+
+#Query micro-batching (web service)
+QUERY_BATCH         = True
+QUERY_BATCH_WAIT_MS = 5
+QUERY_BATCH_MAX     = 32
+
+#CPU inference backend: torch (fp32) | int8 (dynamic quantization) | onnx (ONNX Runtime)
+INFER_BACKEND = os.environ.get("INTELLISEARCH_BACKEND", "torch")
+
+#Vector encoding: fp32 | fp16 | sq8 (int8 scalar quantization) | pq
+ANN_ENCODING           = "fp32"
+ANN_PCA_DIM            = 0
+ANN_RESCORE            = False
+ANN_RESCORE_FACTOR     = 4
+ENCODING_REPORT_SAMPLE = 20000
+
+#Image captioning
+CAPTION_BATCH          = 6
+CAPTION_BATCH_MAX      = 32
+CAPTION_DECODE_WORKERS = 4
+CAPTION_SIZE           = 384
+CAPTION_MIN_SIDE       = 48
+CAPTION_MIN_BYTES      = 1024
+
+#Profiling (--profile / INTELLISEARCH_PROFILE=1)
+PROFILE            = os.environ.get("INTELLISEARCH_PROFILE", "0") == "1"
+PROFILE_TRACE      = "profile_trace.json"
+PROFILE_PROM       = "profile.prom"
+PROFILE_MAX_EVENTS = 200000
+
+#Federated search (several indexes per query)
+FEDERATED_WORKERS = 8
+FEDERATED_MAX_MB  = 4096
+FEDERATED_MMAP    = True
+
+#Batch queries (--queries)
+BATCH_QUERY_SIZE      = 256
+BATCH_LLM_CONCURRENCY = 4
+BATCH_LLM_TIMEOUT     = 120
@@ -0,0 +1,135 @@
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch
+
+from app import config
+from app.config import CACHE_DIR
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def current_backend() -> str:
+    return config.INFER_BACKEND
+
+
+def model_key(model: str, backend: str = None) -> str:
+    # Cache key for vectors produced by `model` under the active backend
+    backend = backend or current_backend()
+    return model if backend == "torch" else f"{model}@{backend}"
+
+
+def artifact_path(model: str, backend: str) -> Path:
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+    return Path(CACHE_DIR, "models", f"{slug}-{backend}")
+
+
+def quantize_int8(module: torch.nn.Module) -> torch.nn.Module:
+    # Dynamic int8 quantization of every Linear layer (weights int8, activations fp32).
+    # Done at load time: a saved copy would still need the fp32 model to rebuild
+    # the module around it, and quantizing takes seconds.
+    print("-> Quantizing to int8 …")
+    return torch.ao.quantization.quantize_dynamic(
+        module.eval(), {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def cached_export(model: str, backend: str, export: Callable[[Path], None]) -> Path:
+    # Runs export(tmp_dir) once and keeps the result under cache/models/
+    path = artifact_path(model, backend)
+    if path.exists():
+        return path
+
+    print(f"-> Exporting {model} to {backend} …")
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.parent.mkdir(parents=True, exist_ok=True)
+    export(tmp)
+    tmp.rename(path)
+    return path
+
+
+def _unit(vectors):
+    x = np.asarray(vectors, dtype="float32")
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-12)
+
+
+def _timed(fn, *args):
+    t = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t
+
+
+def check_backend(
+    backend: str,
+    texts: List[str],
+    queries: List[str],
+    k: int = 10,
+    summaries: int = 8,
+) -> Dict:
+    # Accuracy and throughput of `backend` against the fp32 torch path
+    from app.core.models import load_embeddings, load_summarizer
+    from app.core.text_utils import generate_summaries
+
+    report: Dict = {"backend": backend, "texts": len(texts), "queries": len(queries)}
+
+    ref = load_embeddings("torch")
+    cand = load_embeddings(backend)
+    ref.embed_documents(texts[:4])
+    cand.embed_documents(texts[:4])
+
+    ref_docs, t_ref = _timed(ref.embed_documents, texts)
+    cand_docs, t_cand = _timed(cand.embed_documents, texts)
+    ref_docs, cand_docs = _unit(ref_docs), _unit(cand_docs)
+    cos = (ref_docs * cand_docs).sum(axis=1)
+
+    # Same top-k neighbours under both backends?
+    ref_q = _unit(ref.embed_documents(queries))
+    cand_q = _unit(cand.embed_documents(queries))
+    k = min(k, len(texts))
+    ref_top = (ref_q @ ref_docs.T).argsort(axis=1)[:, ::-1][:, :k]
+    cand_top = (cand_q @ cand_docs.T).argsort(axis=1)[:, ::-1][:, :k]
+    overlap = sum(len(set(a) & set(b)) for a, b in zip(ref_top, cand_top)) / max(1, ref_top.size)
+
+    report["embed"] = {
+        "fp32_texts_per_s": len(texts) / t_ref,
+        "texts_per_s": len(texts) / t_cand,
+        "speedup": t_ref / t_cand,
+        "cosine_mean": float(cos.mean()),
+        "cosine_min": float(cos.min()),
+        f"overlap@{k}": overlap,
+    }
+
+    long_texts = [t for t in texts if len(t.split()) >= 60][:summaries]
+    if long_texts:
+        ref_s, t_ref = _timed(generate_summaries, *load_summarizer("torch"), long_texts)
+        cand_s, t_cand = _timed(generate_summaries, *load_summarizer(backend), long_texts)
+        jaccard = [
+            len(set(a.split()) & set(b.split())) / max(1, len(set(a.split()) | set(b.split())))
+            for a, b in zip(ref_s, cand_s)
+        ]
+        report["summarize"] = {
+            "fp32_s_per_text": t_ref / len(long_texts),
+            "s_per_text": t_cand / len(long_texts),
+            "speedup": t_ref / t_cand,
+            "word_jaccard": sum(jaccard) / len(jaccard),
+        }
+
+    print(f"📊 Backend '{backend}' vs fp32 torch ({len(texts)} texts, {len(queries)} queries):")
+    e = report["embed"]
+    print(
+        f"   embed      {e['texts_per_s']:.1f} texts/s vs {e['fp32_texts_per_s']:.1f} "
+        f"(x{e['speedup']:.2f})   cosine mean {e['cosine_mean']:.4f} min {e['cosine_min']:.4f}   "
+        f"overlap@{k} {overlap:.3f}"
+    )
+    if "summarize" in report:
+        s = report["summarize"]
+        print(
+            f"   summarize  {s['s_per_text']:.2f} s/text vs {s['fp32_s_per_text']:.2f} "
+            f"(x{s['speedup']:.2f})   word jaccard {s['word_jaccard']:.3f}"
+        )
+    return report
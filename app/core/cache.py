@@ -0,0 +1,182 @@
+import hashlib
+import json
+import sqlite3
+import time
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from app.config import (
+    CACHE_DIR,
+    CACHE_MAX_MB,
+    EMBED_MODEL,
+    CAPTION_MODEL,
+    SUMMARIZER,
+    EXTRACT_BUDGET,
+    PDF_MAX_PAGES,
+)
+
+
+def content_hash(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8", "surrogatepass")
+    return hashlib.sha1(data).hexdigest()
+
+
+# Bump when extraction/chunking changes so stale text entries stop matching
+# (budget settings are part of it, so changing a budget re-extracts)
+EXTRACT_VERSION = "extract-v2-" + content_hash(
+    json.dumps([EXTRACT_BUDGET, PDF_MAX_PAGES], sort_keys=True)
+)[:8]
+
+
+# Persistent content-addressed cache (SQLite, LRU-evicted under a size cap)
+class ContentCache:
+
+    def __init__(self, path: Path = None, max_mb: int = CACHE_MAX_MB):
+        path = Path(path) if path else Path(CACHE_DIR) / "content_cache.sqlite"
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.db = sqlite3.connect(str(path))
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, kind TEXT, value BLOB,"
+            " size INTEGER, atime REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_atime ON entries(atime)")
+
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.total = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+        self.hits = Counter()
+        self.misses = Counter()
+        self._writes = 0
+
+
+    def get(self, kind: str, key: str) -> Optional[bytes]:
+        k = f"{kind}:{key}"
+        row = self.db.execute("SELECT value FROM entries WHERE key=?", (k,)).fetchone()
+        if row is None:
+            self.misses[kind] += 1
+            return None
+
+        self.hits[kind] += 1
+        self.db.execute("UPDATE entries SET atime=? WHERE key=?", (time.time(), k))
+        self._touch()
+        return row[0]
+
+    def put(self, kind: str, key: str, value: bytes):
+        k = f"{kind}:{key}"
+        old = self.db.execute("SELECT size FROM entries WHERE key=?", (k,)).fetchone()
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries (key, kind, value, size, atime) VALUES (?, ?, ?, ?, ?)",
+            (k, kind, value, len(value), time.time()),
+        )
+        self.total += len(value) - (old[0] if old else 0)
+        if self.total > self.max_bytes:
+            self._evict()
+        self._touch()
+
+    def _evict(self):
+        # Drop least recently used entries until 10% under the cap
+        target = self.max_bytes * 0.9
+        doomed = []
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY atime"):
+            if self.total <= target:
+                break
+            doomed.append((key,))
+            self.total -= size
+        self.db.executemany("DELETE FROM entries WHERE key=?", doomed)
+
+    def _touch(self):
+        self._writes += 1
+        if self._writes >= 512:
+            self.flush()
+
+    def flush(self):
+        self.db.commit()
+        self._writes = 0
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+    # file (path, size, mtime) -> extracted chunks
+    def get_text(self, path: Path, size: int, mtime: int) -> Optional[List[str]]:
+        raw = self.get("text", content_hash(f"{EXTRACT_VERSION}|{path}|{size}|{mtime}"))
+        return json.loads(raw) if raw is not None else None
+
+    def put_text(self, path: Path, size: int, mtime: int, chunks: List[str]):
+        key = content_hash(f"{EXTRACT_VERSION}|{path}|{size}|{mtime}")
+        self.put("text", key, json.dumps(chunks).encode("utf-8"))
+
+    # chunk hash -> summary (callers pass model_key(SUMMARIZER) so backends don't mix)
+    def get_summary(self, text: str, model: str = SUMMARIZER) -> Optional[str]:
+        raw = self.get("summary", f"{model}:{content_hash(text)}")
+        return raw.decode("utf-8") if raw is not None else None
+
+    def put_summary(self, text: str, summary: str, model: str = SUMMARIZER):
+        self.put("summary", f"{model}:{content_hash(text)}", summary.encode("utf-8"))
+
+    # chunk hash -> embedding vector (float32)
+    def get_vector(self, text: str, model: str = EMBED_MODEL) -> Optional[List[float]]:
+        raw = self.get("vector", f"{model}:{content_hash(text)}")
+        return array("f", raw).tolist() if raw is not None else None
+
+    def put_vector(self, text: str, vec: List[float], model: str = EMBED_MODEL):
+        self.put("vector", f"{model}:{content_hash(text)}", array("f", vec).tobytes())
+
+    # image bytes hash -> caption (callers pass model_key(CAPTION_MODEL))
+    def _image_key(self, path: Path, model: str) -> Optional[str]:
+        try:
+            return f"{model}:{content_hash(Path(path).read_bytes())}"
+        except Exception:
+            return None
+
+    def get_caption(self, path: Path, model: str = CAPTION_MODEL) -> Optional[str]:
+        key = self._image_key(path, model)
+        if key is None:
+            return None
+        raw = self.get("caption", key)
+        return raw.decode("utf-8") if raw is not None else None
+
+    def put_caption(self, path: Path, caption: str, model: str = CAPTION_MODEL):
+        key = self._image_key(path, model)
+        if key is not None:
+            self.put("caption", key, caption.encode("utf-8"))
+
+
+    def report(self):
+        print("🗃️ Cache hits / misses:")
+        for kind in sorted(set(self.hits) | set(self.misses)):
+            print(f"   {kind:<8} {self.hits[kind]:>8} / {self.misses[kind]:<8}")
+        print(f"   size     {self.total / 1024 / 1024:.1f} MB of {self.max_bytes / 1024 / 1024:.0f} MB")
+
+
+class CachedEmbeddings(Embeddings):
+    # Wraps an embedder so only texts missing from the cache reach the model
+
+    def __init__(self, inner: Embeddings, cache: ContentCache, model: str = EMBED_MODEL):
+        self.inner = inner
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        out = [self.cache.get_vector(t, self.model) for t in texts]
+        miss = [i for i, v in enumerate(out) if v is None]
+
+        if miss:
+            vecs = self.inner.embed_documents([texts[i] for i in miss])
+            for i, vec in zip(miss, vecs):
+                out[i] = vec
+                self.cache.put_vector(texts[i], vec, self.model)
+
+        return out
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
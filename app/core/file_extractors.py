@@ -1,53 +1,172 @@
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
 import pandas as pd
 from pathlib import Path
-from pdfminer.high_level import extract_text as pdf_text
-from docx import Document as Docx
-from pptx import Presentation
+from typing import Iterable
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTTextContainer
 
+from app.config import EXTRACT_BUDGET, PDF_MAX_PAGES, CSV_CHUNK_ROWS
 
-def _extract_excel(path: Path) -> str:
+
+def budget_for(ext: str) -> int:
+    return EXTRACT_BUDGET.get(ext, EXTRACT_BUDGET["default"])
+
+
+def _take(parts: Iterable[str], budget: int) -> str:
+    # Joins lines from a lazy source and stops pulling once the budget is reached
+    out, n = [], 0
+    for part in parts:
+        out.append(part)
+        n += len(part) + 1
+        if n >= budget:
+            break
+    return "\n".join(out)[:budget]
+
+
+def _csv_rows(path: Path) -> Iterable[str]:
+    for df in pd.read_csv(
+        path,
+        dtype=str,
+        keep_default_na=False,
+        chunksize=CSV_CHUNK_ROWS,
+    ):
+        yield from df.astype(str).agg(" ".join, axis=1)
+
+
+def _xlsx_rows(path: Path) -> Iterable[str]:
+    # Read-only mode streams rows from the sheet XML instead of loading the workbook
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            for row in ws.iter_rows(values_only=True):
+                cells = [str(v) for v in row if v is not None]
+                if cells:
+                    yield " ".join(cells)
+    finally:
+        wb.close()
+
+
+def _xls_rows(path: Path) -> Iterable[str]:
+    # Legacy .xls (BIFF) is not readable by openpyxl; sheets are loaded one at a time
+    import xlrd
+
+    wb = xlrd.open_workbook(str(path), on_demand=True)
+    try:
+        for i in range(wb.nsheets):
+            ws = wb.sheet_by_index(i)
+            for r in range(ws.nrows):
+                cells = [str(v) for v in ws.row_values(r) if v != ""]
+                if cells:
+                    yield " ".join(cells)
+            wb.unload_sheet(i)
+    finally:
+        wb.release_resources()
+
+
+def _pdf_pages(path: Path) -> Iterable[str]:
+    # One page is laid out at a time; stops after PDF_MAX_PAGES
+    for page in extract_pages(path, maxpages=PDF_MAX_PAGES):
+        yield "".join(el.get_text() for el in page if isinstance(el, LTTextContainer))
+
+
+# Office Open XML namespaces (docx / pptx are zip packages of XML parts)
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+
+def _xml_paragraphs(f, ns: str) -> Iterable[str]:
+    # Streams paragraph text out of one XML part; parsing stops when the caller
+    # stops pulling, so only the part up to the budget is ever read
+    runs, props = [], 0
+    for event, el in ET.iterparse(f, events=("start", "end")):
+        if el.tag == ns + "pPr":
+            # Tab stops in paragraph properties are not text
+            props += 1 if event == "start" else -1
+        elif event == "start":
+            continue
+        elif el.tag == ns + "t":
+            runs.append(el.text or "")
+        elif el.tag == ns + "tab" and not props:
+            runs.append("\t")
+        elif el.tag in (ns + "br", ns + "cr"):
+            # Soft line breaks, as python-docx / python-pptx returned them
+            runs.append("\n")
+        elif el.tag == ns + "p":
+            yield "".join(runs)
+            runs = []
+            el.clear()
+
+
+def _part(pkg: zipfile.ZipFile, source: str, rid: str = None, kind: str = None) -> str:
+    # Resolves a relationship of `source` (by id or type suffix) to a zip member name
+    base, name = posixpath.split(source)
+    rels = ET.fromstring(pkg.read(posixpath.join(base, "_rels", name + ".rels")))
+    for rel in rels:
+        if rel.get("Id") == rid or (kind and rel.get("Type", "").endswith(kind)):
+            target = rel.get("Target")
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join(base, target))
+    raise KeyError(rid or kind)
+
+
+def _docx_paragraphs(path: Path) -> Iterable[str]:
+    # Body paragraphs (table cells included) in document order
+    with zipfile.ZipFile(path) as pkg:
+        with pkg.open(_part(pkg, "", kind="/officeDocument")) as f:
+            yield from _xml_paragraphs(f, _W)
+
+
+def _pptx_paragraphs(path: Path) -> Iterable[str]:
+    # Slide text in presentation order; later slides are not opened once the budget is met
+    with zipfile.ZipFile(path) as pkg:
+        main = _part(pkg, "", kind="/officeDocument")
+        for sld in ET.fromstring(pkg.read(main)).iter(_P + "sldId"):
+            with pkg.open(_part(pkg, main, rid=sld.get(_R + "id"))) as f:
+                yield from _xml_paragraphs(f, _A)
+
+
+def _read_text(path: Path, budget: int) -> str:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read(budget)
+
+
+def _extract_excel(path: Path, budget: int) -> str:
     try:
         if path.suffix.lower() == ".csv":
-            df = pd.read_csv(path, dtype=str, keep_default_na=False)
-            return "\n".join(df.astype(str).agg(" ".join, axis=1))
-
-        sheets = pd.read_excel(
-            path,
-            sheet_name=None,
-            dtype=str,
-            engine="openpyxl"
-        )
-        rows = []
-        for df in sheets.values():
-            rows += df.astype(str).agg(" ".join, axis=1).tolist()
-
-        return "\n".join(rows)
+            return _take(_csv_rows(path), budget)
+        if path.suffix.lower() == ".xls":
+            return _take(_xls_rows(path), budget)
+        return _take(_xlsx_rows(path), budget)
     except Exception:
         return ""
 
 
-def extract_text(path: Path) -> str:
+def extract_text(path: Path, budget: int = None) -> str:
+    # At most `budget` characters (per-type default from EXTRACT_BUDGET)
     ext = path.suffix.lower().lstrip(".")
+    budget = budget or budget_for(ext)
     try:
         if ext in {"txt", "py", "java"}:
-            return path.read_text("utf-8", errors="ignore")
+            return _read_text(path, budget)
 
         if ext in {"csv", "xls", "xlsx"}:
-            return _extract_excel(path)
+            return _extract_excel(path, budget)
 
         if ext == "docx":
-            return "\n".join(p.text for p in Docx(path).paragraphs)
+            return _take(_docx_paragraphs(path), budget)
 
         if ext == "pptx":
-            return "\n".join(
-                sh.text
-                for sl in Presentation(path).slides
-                for sh in sl.shapes
-                if hasattr(sh, "text")
-            )
+            return _take(_pptx_paragraphs(path), budget)
 
         if ext == "pdf":
-            return pdf_text(path)
+            return _take(_pdf_pages(path), budget)
 
     except Exception:
         return ""
@@ -1,27 +1,153 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from PIL import Image
 import torch
 
+from app.config import (
+    CAPTION_BATCH,
+    CAPTION_BATCH_MAX,
+    CAPTION_DECODE_WORKERS,
+    CAPTION_SIZE,
+    CAPTION_MIN_SIDE,
+    CAPTION_MIN_BYTES,
+    CAPTION_MODEL,
+)
+from app.core.backends import model_key
 from app.core.device import DEVICE
-from app.core.models import load_caption_model
+from app.core.models import get_caption_model
 
-caption_proc, caption_model = load_caption_model()
+
+def load_image(path: Path, size: int = CAPTION_SIZE) -> Optional[Image.Image]:
+    # Decoded at roughly model resolution; None for icons and unreadable files
+    try:
+        if os.path.getsize(path) < CAPTION_MIN_BYTES:
+            return None
+        with Image.open(path) as im:
+            # Only the header has been read so far
+            if min(im.size) < CAPTION_MIN_SIDE:
+                return None
+            # JPEG: let the decoder downscale by 1/2..1/8 instead of decoding full size
+            im.draft("RGB", (size, size))
+            im = im.convert("RGB")
+        im.thumbnail((size * 2, size * 2), Image.BICUBIC)
+        return im
+    except Exception:
+        return None
+
+
+class _BatchSizer:
+    # Grows the batch while images/s keeps improving, backs off when it drops
+
+    def __init__(self, start: int, limit: int):
+        self.size = max(1, start)
+        self.limit = max(self.size, limit)
+        self.best = 0.0
+
+    def update(self, n: int, seconds: float):
+        rate = n / max(seconds, 1e-6)
+        if n < self.size:
+            return
+        if rate >= self.best * 0.95:
+            self.best = max(self.best, rate)
+            self.size = min(self.limit, self.size * 2)
+        elif rate < self.best * 0.8:
+            self.size = max(1, self.size // 2)
+
+
+def _generate(caption_proc, caption_model, imgs) -> List[str]:
+    inp = caption_proc(
+        images=imgs,
+        return_tensors="pt",
+        padding=True
+    ).to(DEVICE)
+
+    out = caption_model.generate(**inp, max_new_tokens=20)
+    return caption_proc.batch_decode(out, skip_special_tokens=True)
+
+
+def _generate_safe(caption_proc, caption_model, imgs) -> List[str]:
+    # A failing batch is split so one bad image only loses its own caption
+    try:
+        return _generate(caption_proc, caption_model, imgs)
+    except Exception:
+        if len(imgs) == 1:
+            return [""]
+        mid = len(imgs) // 2
+        return (
+            _generate_safe(caption_proc, caption_model, imgs[:mid])
+            + _generate_safe(caption_proc, caption_model, imgs[mid:])
+        )
 
 
 @torch.inference_mode()
-def caption_images(paths: List[Path], batch: int = 6) -> List[str]:
-    caps: List[str] = []
+def caption_images(
+    paths: List[Path],
+    batch: int = CAPTION_BATCH,
+    cache=None,
+    max_batch: int = CAPTION_BATCH_MAX,
+    workers: int = CAPTION_DECODE_WORKERS,
+) -> List[str]:
+    # "" for images that were skipped (icons, unreadable files)
+    caps: List[Optional[str]] = [None] * len(paths)
+    # Backend in the key: int8 / onnx captions are not the fp32 model's
+    model = model_key(CAPTION_MODEL)
+    if cache is not None:
+        caps = [cache.get_caption(p, model) for p in paths]
+
+    todo = [i for i, c in enumerate(caps) if c is None]
+    if not todo:
+        return [c.lower() for c in caps]
+
+    caption_proc, caption_model = get_caption_model()
+    sizer = _BatchSizer(batch, max_batch)
+    skipped = 0
+
+    # Decoding runs ahead in threads while the model generates
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        pending = deque()
+        queue = iter(todo)
+
+        def fill():
+            while len(pending) < sizer.size * 2:
+                i = next(queue, None)
+                if i is None:
+                    return
+                pending.append((i, pool.submit(load_image, paths[i])))
+
+        fill()
+        while pending:
+            idx, imgs = [], []
+            while len(idx) < sizer.size:
+                if not pending:
+                    fill()
+                if not pending:
+                    break
+                i, fut = pending.popleft()
+                img = fut.result()
+                if img is None:
+                    caps[i] = ""
+                    skipped += 1
+                    continue
+                idx.append(i)
+                imgs.append(img)
+            fill()
+
+            if not imgs:
+                continue
 
-    for i in range(0, len(paths), batch):
-        imgs = [Image.open(p).convert("RGB") for p in paths[i:i+batch]]
-        inp = caption_proc(
-            images=imgs,
-            return_tensors="pt",
-            padding=True
-        ).to(DEVICE)
+            t = time.perf_counter()
+            results = _generate_safe(caption_proc, caption_model, imgs)
+            sizer.update(len(imgs), time.perf_counter() - t)
 
-        out = caption_model.generate(**inp, max_new_tokens=20)
-        caps += caption_proc.batch_decode(out, skip_special_tokens=True)
+            for i, cap in zip(idx, results):
+                caps[i] = cap
+                if cache is not None and cap:
+                    cache.put_caption(paths[i], cap, model)
 
+    if skipped:
+        print(f"-> Skipped {skipped} icons / unreadable images")
     return [c.lower() for c in caps]
@@ -1,46 +1,182 @@
+import threading
+from typing import Any, Callable, Dict, List
+
 import torch
 from packaging.version import parse as version_parse
-from transformers import (
-    BlipProcessor, BlipForConditionalGeneration,
-    AutoTokenizer, AutoModelForSeq2SeqLM,
-)
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 
+from app import config
 from app.config import *
 from app.core.device import DEVICE
+from app.core.backends import current_backend, cached_export, model_key, quantize_int8
+from app.utils.timing import timed
 
 
-def load_caption_model():
-    caption_proc = BlipProcessor.from_pretrained(CAPTION_MODEL)
+def _cpu_backend(backend: str = None) -> str:
+    # int8 / onnx are CPU backends; CUDA keeps the fp16 torch path
+    backend = backend or current_backend()
+    if backend != "torch" and DEVICE.type == "cuda":
+        print(f"Inference backend '{backend}' is CPU-only – using torch on {DEVICE}.")
+        return "torch"
+    return backend
+
+
+def _onnx_or_int8(what: str) -> str:
+    # optimum[onnxruntime] is optional; without it the onnx backend runs as int8, and
+    # the backend is switched globally so cache keys name what actually ran
     try:
-        caption_model = BlipForConditionalGeneration.from_pretrained(
-            CAPTION_MODEL,
-            torch_dtype=torch.float16 if DEVICE.type=="cuda" else torch.float32,
-            use_safetensors=True,
-        ).to(DEVICE).eval()
-    except (FileNotFoundError, ValueError):
-        if version_parse(torch.__version__) < version_parse("2.6"):
-            raise RuntimeError("BLIP weights need safetensors or torch ≥2.6.")
-        caption_model = BlipForConditionalGeneration.from_pretrained(
-            CAPTION_MODEL,
-            torch_dtype=torch.float16 if DEVICE.type=="cuda" else torch.float32,
-            use_safetensors=False,
-        ).to(DEVICE).eval()
+        import optimum.onnxruntime
+    except ImportError:
+        print(f"optimum[onnxruntime] not installed – using int8 for {what}.")
+        config.INFER_BACKEND = "int8"
+        return "int8"
+    return "onnx"
+
+
+def load_caption_model(backend: str = None):
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+
+    backend = _cpu_backend(backend)
+    if backend == "onnx":
+        # BLIP generation has no ONNX Runtime export; int8 is the fast CPU path for it
+        print("No ONNX export for the captioner – using int8.")
+        backend = "int8"
+
+    def fp32():
+        try:
+            return BlipForConditionalGeneration.from_pretrained(
+                CAPTION_MODEL,
+                torch_dtype=torch.float16 if DEVICE.type=="cuda" else torch.float32,
+                use_safetensors=True,
+            ).to(DEVICE).eval()
+        except (FileNotFoundError, ValueError):
+            if version_parse(torch.__version__) < version_parse("2.6"):
+                raise RuntimeError("BLIP weights need safetensors or torch ≥2.6.")
+            return BlipForConditionalGeneration.from_pretrained(
+                CAPTION_MODEL,
+                torch_dtype=torch.float16 if DEVICE.type=="cuda" else torch.float32,
+                use_safetensors=False,
+            ).to(DEVICE).eval()
+
+    caption_proc = BlipProcessor.from_pretrained(CAPTION_MODEL)
+    if backend == "int8":
+        caption_model = quantize_int8(fp32())
+    else:
+        caption_model = fp32()
 
     return caption_proc, caption_model
 
 
-def load_summarizer():
+def load_summarizer(backend: str = None):
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+    backend = _cpu_backend(backend)
     sum_tok = AutoTokenizer.from_pretrained(SUMMARIZER)
-    sum_mod = AutoModelForSeq2SeqLM.from_pretrained(
-        SUMMARIZER,
-        torch_dtype=torch.float16 if DEVICE.type=="cuda" else torch.float32,
-    ).to(DEVICE).eval()
 
-    return sum_tok, sum_mod
+    def fp32():
+        return AutoModelForSeq2SeqLM.from_pretrained(
+            SUMMARIZER,
+            torch_dtype=torch.float16 if DEVICE.type=="cuda" else torch.float32,
+        ).to(DEVICE).eval()
+
+    if backend == "onnx":
+        backend = _onnx_or_int8("the summarizer")
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        path = cached_export(
+            SUMMARIZER,
+            "onnx",
+            lambda out: ORTModelForSeq2SeqLM.from_pretrained(SUMMARIZER, export=True).save_pretrained(str(out)),
+        )
+        return sum_tok, ORTModelForSeq2SeqLM.from_pretrained(str(path))
+
+    if backend == "int8":
+        return sum_tok, quantize_int8(fp32())
+    return sum_tok, fp32()
+
+
+def load_embeddings(backend: str = None):
+    backend = _cpu_backend(backend)
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(
+            model_name=EMBED_MODEL,
+            model_kwargs={"device": DEVICE},
+        )
+
+    from sentence_transformers import SentenceTransformer
 
-def load_embeddings():
-    return HuggingFaceEmbeddings(
-        model_name=EMBED_MODEL,
-        model_kwargs={"device": DEVICE},
+    if backend == "onnx":
+        backend = _onnx_or_int8("embeddings")
+    if backend == "onnx":
+        path = cached_export(
+            EMBED_MODEL,
+            "onnx",
+            lambda out: SentenceTransformer(EMBED_MODEL, device="cpu", backend="onnx").save_pretrained(str(out)),
+        )
+        return SentenceEmbeddings(SentenceTransformer(str(path), device="cpu", backend="onnx"))
+
+    return SentenceEmbeddings(
+        quantize_int8(SentenceTransformer(EMBED_MODEL, device="cpu"))
     )
+
+
+class SentenceEmbeddings(Embeddings):
+    # Embeddings over a ready SentenceTransformer (same output as HuggingFaceEmbeddings defaults)
+
+    def __init__(self, client):
+        self.client = client
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = [t.replace("\n", " ") for t in texts]
+        return self.client.encode(texts, convert_to_numpy=True).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+# Process-wide model registry (each model is loaded on first use, then shared)
+_models: Dict[str, Any] = {}
+_models_lock = threading.Lock()
+
+
+def _get(key: str, loader: Callable[[], Any]):
+    with _models_lock:
+        if key not in _models:
+            with timed(f"load {key}"):
+                _models[key] = loader()
+        return _models[key]
+
+
+def get_caption_model():
+    return _get("captioner", load_caption_model)
+
+
+def get_summarizer():
+    return _get("summarizer", load_summarizer)
+
+
+def get_embeddings():
+    return _get("embeddings", load_embeddings)
+
+
+def get_query_embeddings():
+    # The embedder behind a process-wide query -> vector LRU
+    from app.core.query_cache import QueryCache
+    return _get("query_cache", lambda: QueryCache(get_embeddings(), model=model_key(EMBED_MODEL)))
+
+
+def loaded_models() -> List[str]:
+    return list(_models)
+
+
+class LazyEmbeddings(Embeddings):
+    # Stand-in for FAISS.load_local: the embedder is only loaded once something is embedded
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return get_embeddings().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return get_embeddings().embed_query(text)
@@ -0,0 +1,145 @@
+import atexit
+import base64
+import json
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from app.config import (
+    CACHE_DIR,
+    EMBED_MODEL,
+    QUERY_CACHE_SIZE,
+    QUERY_CACHE_PERSIST,
+)
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    # bge is uncased, so case and spacing never change the vector
+    return _SPACE_RE.sub(" ", (text or "").lower()).strip().rstrip("?!. ")
+
+
+# Normalized query -> vector LRU in front of an embedder (documents pass straight through)
+class QueryCache(Embeddings):
+
+    def __init__(
+        self,
+        inner: Embeddings,
+        model: str = EMBED_MODEL,
+        size: int = QUERY_CACHE_SIZE,
+        persist: bool = QUERY_CACHE_PERSIST,
+    ):
+        self.inner = inner
+        self.model = model
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.path = None
+
+        if persist:
+            slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+            self.path = Path(CACHE_DIR) / f"queries_{slug}.json"
+            self._load()
+            atexit.register(self.save)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return vec.tolist()
+            self.misses += 1
+
+        vec = self.inner.embed_query(text)
+        self.put(key, vec)
+        return vec
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # Batched embed_query: cached vectors are reused, the misses go through one
+        # forward pass (HuggingFaceEmbeddings encodes queries and documents alike)
+        keys = [normalize_query(t) for t in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                vec = self._lru.get(key)
+                if vec is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vec.tolist()
+
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                todo.setdefault(key, text)
+
+        with self._lock:
+            self.hits += len(keys) - len(todo)
+            self.misses += len(todo)
+
+        if todo:
+            for key, vec in zip(todo, self.inner.embed_documents(list(todo.values()))):
+                self.put(key, vec)
+                found[key] = vec
+        return [found[key] for key in keys]
+
+    def put(self, key: str, vec: List[float]):
+        with self._lock:
+            self._lru[key] = array("f", vec)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.size:
+                self._lru.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is None:
+                return None
+            self._lru.move_to_end(key)
+            return vec.tolist()
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self):
+        print(
+            f"🔁 Query cache: {self.hits} hits / {self.misses} misses "
+            f"({self.hit_rate():.0%}), {len(self._lru)} entries"
+        )
+
+
+    # Saved as JSON (vectors base64-encoded float32): nothing in the cache dir is unpickled
+    def _load(self):
+        try:
+            saved = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if saved.get("model") != self.model:
+            return
+        for key, raw in saved.get("entries", [])[-self.size:]:
+            self._lru[key] = array("f", base64.b64decode(raw))
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            entries = [(k, base64.b64encode(v.tobytes()).decode("ascii")) for k, v in self._lru.items()]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"model": self.model, "entries": entries}), encoding="utf-8")
+            tmp.replace(self.path)
+        except Exception as e:
+            print("⚠️ Could not save query cache:", e)
@@ -4,12 +4,11 @@ from typing import List
 
 from app.config import *
 from app.core.device import DEVICE
-from app.core.models import load_summarizer
+from app.core.backends import model_key
+from app.core.models import get_summarizer
 
 WORD_RE = re.compile(r"\b[a-z]{3,}\b")
 
-sum_tok, sum_mod = load_summarizer()
-
 
 def clean_words(text: str) -> List[str]:
     uniq: List[str] = []
@@ -34,23 +33,68 @@ def chunk_text(text: str) -> List[str]:
 
 
 @torch.inference_mode()
-def summarize(text: str, max_len: int = 160) -> str:
-    if not text:
-        return ""
-    if len(text.split()) < 60:
-        return text[:400]
+def summarize_batch(
+    texts: List[str],
+    max_len: int = 160,
+    batch: int = SUMMARY_BATCH,
+    cache=None,
+) -> List[str]:
+    out: List[str] = [""] * len(texts)
+    todo = []
+    # Backend in the key: int8 / onnx summaries are not the fp32 model's
+    model = model_key(SUMMARIZER)
+
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        n_words = len(text.split())
+        if n_words < 60:
+            out[i] = text[:400]
+            continue
+
+        hit = cache.get_summary(text, model) if cache is not None else None
+        if hit is not None:
+            out[i] = hit
+        else:
+            todo.append((n_words, i))
+
+    if not todo:
+        return out
+
+    sum_tok, sum_mod = get_summarizer()
 
+    # Bucket by length so each generate() pads to similarly sized inputs
+    todo.sort()
+    for j in range(0, len(todo), batch):
+        idx = [i for _, i in todo[j:j+batch]]
+        summaries = generate_summaries(sum_tok, sum_mod, [texts[i] for i in idx], max_len)
+
+        for i, summary in zip(idx, summaries):
+            out[i] = summary
+            if cache is not None:
+                cache.put_summary(texts[i], summary, model)
+
+    return out
+
+
+@torch.inference_mode()
+def generate_summaries(sum_tok, sum_mod, texts: List[str], max_len: int = 160) -> List[str]:
+    # One padded generate() over `texts` (any backend from load_summarizer)
     inp = sum_tok(
-        text,
+        texts,
         max_length=1024,
         truncation=True,
+        padding=True,
         return_tensors="pt"
     ).to(DEVICE)
 
-    out = sum_mod.generate(
+    gen = sum_mod.generate(
         **inp,
         max_length=max_len,
         min_length=40
     )
+    return sum_tok.batch_decode(gen, skip_special_tokens=True)
+
 
-    return sum_tok.decode(out[0], skip_special_tokens=True)
+def summarize(text: str, max_len: int = 160) -> str:
+    return summarize_batch([text], max_len=max_len)[0]
@@ -0,0 +1,384 @@
+import math
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from app.config import (
+    ANN_TRAIN_SAMPLE,
+    ANN_PQ_M,
+    ANN_HNSW_M,
+    ANN_NPROBE,
+    ANN_EF_SEARCH,
+    ANN_RESCORE_FACTOR,
+    ENCODING_REPORT_SAMPLE,
+    ANN_TOMBSTONE_MAX,
+)
+
+INDEX_TYPES = ("flat", "ivf", "ivfpq", "hnsw")
+ENCODINGS = ("fp32", "fp16", "sq8", "pq")
+
+
+def factory_string(
+    index_type: str,
+    n: int,
+    d: int,
+    encoding: str = "fp32",
+    pca_dim: int = 0,
+    rescore: bool = False,
+) -> str:
+    nlist = max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+    if index_type == "ivfpq":
+        # Shorthand for ivf + pq; fp32 is the unset default
+        if encoding not in ("fp32", "pq"):
+            raise ValueError(f"index type 'ivfpq' implies pq encoding, got '{encoding}'")
+        index_type, encoding = "ivf", "pq"
+
+    d_out = pca_dim if 0 < pca_dim < d else d
+    # PQ needs a sub-quantizer count that divides the dimension
+    m = max(k for k in range(1, ANN_PQ_M + 1) if d_out % k == 0)
+    code = {"fp32": "Flat", "fp16": "SQfp16", "sq8": "SQ8", "pq": f"PQ{m}"}[encoding]
+
+    if index_type == "ivf":
+        spec = f"IVF{nlist},{code}"
+    elif index_type == "hnsw":
+        spec = f"HNSW{ANN_HNSW_M},Flat" if code == "Flat" else f"HNSW{ANN_HNSW_M}_{code}"
+    else:
+        spec = code
+
+    if d_out != d:
+        spec = f"PCA{d_out},{spec}"
+    # Exact re-scoring: full vectors kept next to the codes (paged in on demand with --mmap)
+    if rescore and (code != "Flat" or d_out != d):
+        spec += ",RFlat"
+    return spec
+
+
+def _inner(index):
+    # The IVF / HNSW / flat index under PCA and re-scoring wrappers
+    index = faiss.downcast_index(index)
+    while True:
+        if isinstance(index, faiss.IndexPreTransform):
+            index = faiss.downcast_index(index.index)
+        elif isinstance(index, faiss.IndexRefine):
+            index = faiss.downcast_index(index.base_index)
+        else:
+            return index
+
+
+def index_bytes(index) -> int:
+    return int(faiss.serialize_index(index).size)
+
+
+def refine_bytes(index) -> int:
+    # Part of the index only touched when re-scoring
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        return index_bytes(index.refine_index)
+    return 0
+
+
+def flat_vectors(index) -> np.ndarray:
+    # IndexFlat storage as an (n, d) array without copying; only valid while
+    # `index` is alive. Other index types are reconstructed (a copy).
+    flat = faiss.downcast_index(index)
+    if isinstance(flat, faiss.IndexFlat):
+        return faiss.rev_swig_ptr(flat.get_xb(), flat.ntotal * flat.d).reshape(flat.ntotal, flat.d)
+    return all_vectors(index)
+
+
+def all_vectors(index) -> np.ndarray:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        # Exact copies are kept for re-scoring
+        return all_vectors(index.refine_index)
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexIVF):
+        inner.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def build_ann(
+    vectors: np.ndarray,
+    index_type: str,
+    metric=faiss.METRIC_L2,
+    encoding: str = "fp32",
+    pca_dim: int = 0,
+    rescore: bool = False,
+):
+    n, d = vectors.shape
+    spec = factory_string(index_type, n, d, encoding, pca_dim, rescore)
+    index = faiss.index_factory(d, spec, metric)
+
+    if not index.is_trained:
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(n, size=min(n, ANN_TRAIN_SAMPLE), replace=False)]
+        print(f"-> Training {spec} on {len(sample)} vectors …")
+        index.train(sample)
+
+    index.add(vectors)
+    return index
+
+
+# Query-time knobs (ignored by index types that do not have them)
+def tune(
+    index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    k_factor: Optional[int] = None,
+):
+    top = faiss.downcast_index(index)
+    if isinstance(top, faiss.IndexRefine):
+        top.k_factor = k_factor or ANN_RESCORE_FACTOR
+
+    index = _inner(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = nprobe or ANN_NPROBE
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search or ANN_EF_SEARCH
+
+
+TOMBSTONES_FILE = "tombstones.npy"
+
+
+def _search_params(index, sel):
+    # Search parameters that apply `sel` to the HNSW graph under any wrappers
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexPreTransform):
+        return faiss.SearchParametersPreTransform(index_params=_search_params(index.index, sel))
+    if isinstance(index, faiss.IndexRefine):
+        return faiss.IndexRefineSearchParameters(
+            base_index_params=_search_params(index.base_index, sel),
+            k_factor=index.k_factor,
+        )
+    return faiss.SearchParametersHNSW(sel=sel, efSearch=index.hnsw.efSearch)
+
+
+def apply_tombstones(store, labels: np.ndarray):
+    # Deleted HNSW labels stay in the graph but are skipped by every search on
+    # store.index (LangChain's and batching.search_vectors alike). Call after tune().
+    labels = np.asarray(labels, dtype="int64")
+    store.tombstones = labels
+    index = store.index
+    index.__dict__.pop("search", None)
+    if not len(labels):
+        return
+
+    batch = faiss.IDSelectorBatch(len(labels), faiss.swig_ptr(labels))
+    sel = faiss.IDSelectorNot(batch)
+    params = _search_params(index, sel)
+    search = type(index).search
+
+    def filtered(x, k, **kwargs):
+        kwargs.setdefault("params", params)
+        return search(index, x, k, **kwargs)
+
+    index.search = filtered
+    index.tombstone_refs = (labels, batch, sel, params)
+
+
+def load_tombstones(store, folder):
+    path = Path(folder) / TOMBSTONES_FILE
+    apply_tombstones(store, np.load(path) if path.exists() else np.empty(0, dtype="int64"))
+
+
+def save_tombstones(store, folder):
+    labels = getattr(store, "tombstones", None)
+    if labels is not None and len(labels):
+        np.save(Path(folder) / TOMBSTONES_FILE, labels)
+
+
+def _relabel_ivf(index, labels: np.ndarray):
+    # remove_ids leaves IVF labels as they were; shift them down so positions stay
+    # dense and match the docstore map (ids only, no vectors are touched)
+    invlists = index.invlists
+    for l in range(index.nlist):
+        n = invlists.list_size(l)
+        if n:
+            ptr = invlists.get_ids(l)
+            ids = faiss.rev_swig_ptr(ptr, n)
+            ids -= np.searchsorted(labels, ids)
+            invlists.release_ids(l, ptr)
+
+
+def _remove_ids(index, labels: np.ndarray):
+    # Drops sorted `labels` and renumbers the rest in order, like IndexFlat.remove_ids
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        _remove_ids(index.base_index, labels)
+        _remove_ids(index.refine_index, labels)
+        index.ntotal = index.base_index.ntotal
+    elif isinstance(index, faiss.IndexPreTransform):
+        _remove_ids(index.index, labels)
+        index.ntotal = index.index.ntotal
+    elif isinstance(index, faiss.IndexIVF):
+        index.set_direct_map_type(faiss.DirectMap.NoMap)
+        index.remove_ids(labels)
+        _relabel_ivf(index, labels)
+    else:
+        # Flat / SQ / PQ codes compact in place
+        index.remove_ids(labels)
+
+
+def _compact_map(store, labels: np.ndarray):
+    gone = set(labels.tolist())
+    live = (doc_id for i, doc_id in sorted(store.index_to_docstore_id.items()) if i not in gone)
+    store.index_to_docstore_id = dict(enumerate(live))
+
+
+def _rebuild(store, labels: np.ndarray):
+    # HNSW cannot delete: rebuild the graph from its own stored vectors
+    keep = np.setdiff1d(np.arange(store.index.ntotal, dtype="int64"), labels)
+    vectors = all_vectors(store.index)[keep]
+
+    index = faiss.clone_index(store.index)
+    index.reset()
+    if len(keep):
+        index.add(vectors)
+    store.index = index
+    _compact_map(store, labels)
+    apply_tombstones(store, np.empty(0, dtype="int64"))
+
+
+def remove_vectors(store, ids: List[str]):
+    # Flat, IVF and coded indexes drop the labels in place and renumber the rest;
+    # HNSW marks them deleted and is rebuilt once ANN_TOMBSTONE_MAX of it is dead.
+    # No re-embedding and no re-encoding of surviving vectors either way.
+    if isinstance(faiss.downcast_index(store.index), faiss.IndexFlat):
+        store.delete(ids)
+        return
+
+    doomed = set(ids)
+    labels = np.array(
+        sorted(i for i, doc_id in store.index_to_docstore_id.items() if doc_id in doomed),
+        dtype="int64",
+    )
+    store.docstore.delete(list(doomed))
+
+    if isinstance(_inner(store.index), faiss.IndexHNSW):
+        tombs = np.union1d(getattr(store, "tombstones", np.empty(0, dtype="int64")), labels)
+        if len(tombs) > ANN_TOMBSTONE_MAX * store.index.ntotal:
+            _rebuild(store, tombs)
+        else:
+            # Map entries stay so new vectors keep getting fresh positions
+            apply_tombstones(store, tombs)
+        return
+
+    _remove_ids(store.index, labels)
+    _compact_map(store, labels)
+
+
+def recall_report(
+    exact,
+    ann,
+    k: int = 10,
+    n_queries: int = 200,
+    nprobes=(1, 4, 16, 64),
+    ef_searches=(16, 32, 64, 128),
+) -> List[Dict]:
+    # recall@k and mean latency of `ann` against the exact index, per knob setting.
+    # Only the sampled query vectors are reconstructed.
+    rng = np.random.default_rng(1)
+    ids = rng.choice(exact.ntotal, size=min(n_queries, exact.ntotal), replace=False)
+    queries = np.vstack([exact.reconstruct(int(i)) for i in ids])
+    queries = queries + rng.normal(0, 0.01, queries.shape).astype("float32")
+
+    t = time.perf_counter()
+    _, truth = exact.search(queries, k)
+    exact_ms = (time.perf_counter() - t) * 1000 / len(queries)
+
+    target = _inner(ann)
+    if isinstance(target, faiss.IndexIVF):
+        settings = [("nprobe", v) for v in nprobes if v <= target.nlist]
+    elif isinstance(target, faiss.IndexHNSW):
+        settings = [("efSearch", v) for v in ef_searches]
+    else:
+        settings = [("-", None)]
+
+    report = [{"setting": "exact", "recall": 1.0, "ms_per_query": exact_ms}]
+    for knob, value in settings:
+        if knob == "nprobe":
+            tune(ann, nprobe=value)
+        elif knob == "efSearch":
+            tune(ann, ef_search=value)
+
+        t = time.perf_counter()
+        _, found = ann.search(queries, k)
+        ms = (time.perf_counter() - t) * 1000 / len(queries)
+
+        hits = sum(len(set(f) & set(g)) for f, g in zip(found, truth))
+        report.append(
+            {
+                "setting": f"{knob}={value}",
+                "recall": hits / truth.size,
+                "ms_per_query": ms,
+            }
+        )
+
+    tune(ann)
+    print(f"📊 Recall@{k} vs exact ({len(queries)} queries):")
+    for r in report:
+        print(f"   {r['setting']:<14} recall {r['recall']:.3f}   {r['ms_per_query']:.3f} ms/query")
+    return report
+
+
+# (label, encoding, pca_dim as a fraction of d, rescore)
+_REPORT_CONFIGS = (
+    ("fp32", "fp32", 0, False),
+    ("fp16", "fp16", 0, False),
+    ("sq8", "sq8", 0, False),
+    ("sq8+rescore", "sq8", 0, True),
+    ("pq", "pq", 0, False),
+    ("pq+rescore", "pq", 0, True),
+    ("pca/2+sq8", "sq8", 2, False),
+    ("pca/4+sq8+rescore", "sq8", 4, True),
+)
+
+
+def encoding_report(
+    vectors: np.ndarray,
+    k: int = 10,
+    n_queries: int = 200,
+    sample: int = ENCODING_REPORT_SAMPLE,
+) -> List[Dict]:
+    # Memory per vector vs recall@k of each flat encoding, on a sample of the vectors
+    rng = np.random.default_rng(2)
+    if len(vectors) > sample:
+        vectors = vectors[rng.choice(len(vectors), size=sample, replace=False)]
+    n, d = vectors.shape
+    queries = vectors[rng.choice(n, size=min(n_queries, n), replace=False)]
+    queries = queries + rng.normal(0, 0.01, queries.shape).astype("float32")
+
+    exact = faiss.IndexFlatL2(d)
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    report = []
+    for label, encoding, pca_div, rescore in _REPORT_CONFIGS:
+        index = build_ann(vectors, "flat", encoding=encoding, pca_dim=d // pca_div if pca_div else 0, rescore=rescore)
+        tune(index)
+        t = time.perf_counter()
+        _, found = index.search(queries, k)
+        ms = (time.perf_counter() - t) * 1000 / len(queries)
+
+        total = index_bytes(index)
+        report.append(
+            {
+                "encoding": label,
+                "bytes_per_vector": total / n,
+                "resident_bytes_per_vector": (total - refine_bytes(index)) / n,
+                "recall": sum(len(set(f) & set(g)) for f, g in zip(found, truth)) / truth.size,
+                "ms_per_query": ms,
+            }
+        )
+
+    print(f"📊 Memory vs recall@{k} ({n} vectors, d={d}; 'mmap' = resident with --mmap):")
+    for r in report:
+        print(
+            f"   {r['encoding']:<18} {r['bytes_per_vector']:7.0f} B/vec   "
+            f"mmap {r['resident_bytes_per_vector']:6.0f} B/vec   recall {r['recall']:.3f}   "
+            f"{r['ms_per_query']:.3f} ms/query"
+        )
+    return report
@@ -1,7 +1,8 @@
 import os
-import json
+import shutil
+import uuid
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple, Iterator
 
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
@@ -10,21 +11,39 @@ from app.config import (
     SUPPORTED_TEXT,
     SUPPORTED_IMG,
     JUNK_EXTS,
+    SUMMARY_BATCH,
+    EMBED_BATCH,
+    IMAGE_BATCH,
+    ANN_INDEX,
+    ANN_MIN_VECTORS,
+    ANN_ENCODING,
+    ANN_PCA_DIM,
+    ANN_RESCORE,
+    EMBED_MODEL,
 )
-from app.core.file_extractors import extract_text
-from app.core.text_utils import chunk_text, summarize, clean_words
+from app.core.text_utils import summarize_batch, clean_words
 from app.core.image_caption import caption_images
-from app.core.models import load_embeddings
-
-#Index Builder Pipeline Module
-def build_index(folder: str, name: str):
-    folder = Path(folder)
-    if not folder.exists():
-        raise RuntimeError(f"Folder not found: {folder}")
+from app.core.models import LazyEmbeddings
+from app.core.backends import model_key
+from app.core.cache import ContentCache, CachedEmbeddings
+from app.indexing.parallel import iter_chunks
+from app.indexing.ann import (
+    build_ann,
+    encoding_report,
+    flat_vectors,
+    index_bytes,
+    recall_report,
+    refine_bytes,
+    tune,
+)
+from app.indexing.lexical import doc_text
+from app.indexing.loader import SqliteDocWriter, save_store
+from app.indexing.rowstore import RowStore, rows_path
+from app.indexing.txn import ROWS_FILE, new_version, stage_index, publish_index
+from app.utils import profile
 
-    rows: List[Dict] = []
-    img_files: List[Path] = []
 
+def _walk(folder: Path) -> Iterator[Tuple[Path, str, Dict]]:
     for root, _, files in os.walk(folder):
         for fn in files:
             ext = Path(fn).suffix.lower().lstrip(".")
@@ -48,78 +67,242 @@ def build_index(folder: str, name: str):
                 "size": size,
                 "mtime": mtime,
             }
+            yield full, ext, entry_base
 
-            if ext in SUPPORTED_TEXT:
-                raw = extract_text(full)[:30000]
-                if not raw.strip():
-                    continue
-
-                for chunk_id, chunk in enumerate(chunk_text(raw)):
-                    rows.append(
-                        {
-                            **entry_base,
-                            "summary": summarize(chunk),
-                            "content": chunk,
-                            "tags": clean_words(chunk) or clean_words(fn),
-                            "chunk_id": chunk_id,
-                        }
+
+def _flush_summaries(pending: List[Dict], cache: ContentCache):
+    texts = [r["content"] for r in pending]
+    with profile.stage("build.summarize"):
+        summaries = summarize_batch(texts, cache=cache)
+    for r, summary in zip(pending, summaries):
+        r["summary"] = summary
+
+
+def _caption_rows(images: List[Tuple[Path, Dict]], cache: ContentCache) -> List[Dict]:
+    with profile.stage("build.caption"):
+        caps = caption_images([full for full, _ in images], cache=cache)
+    profile.count("build.images", len(images))
+    return [
+        {
+            **entry_base,
+            "summary": cap,
+            # Skipped images (icons, unreadable) stay findable by file name
+            "content": cap or full.stem,
+            "tags": clean_words(cap) or clean_words(full.stem),
+            "chunk_id": 0,
+        }
+        for (full, entry_base), cap in zip(images, caps)
+    ]
+
+
+class _IndexSink:
+    # Embeds rows in batches into one FAISS store and streams them to the row store
+
+    def __init__(self, stage: Path, embeddings):
+        self.stage = stage
+        self.embeddings = embeddings
+        self.store = None
+        self.rows = RowStore(stage / ROWS_FILE)
+        self.count = 0
+
+    def add(self, rows: List[Dict]):
+        if not rows:
+            return
+
+        docs = [
+            Document(
+                page_content=r["content"],
+                metadata={
+                    k: r[k]
+                    for k in (
+                        "path",
+                        "type",
+                        "tags",
+                        "summary",
+                        "chunk_id",
+                        "size",
+                        "mtime",
                     )
-            else:
-                img_files.append(full)
-                rows.append(
-                    {
-                        **entry_base,
-                        "tags": ["__IMG__"],
-                        "chunk_id": 0,
-                        "content": "",
-                    }
+                },
+            )
+            for r in rows
+        ]
+
+        # Explicit ids so the lexical index can point at the same docstore entries.
+        # Document text goes to docs.sqlite as each batch is added; only ids and
+        # vectors accumulate in memory.
+        ids = [uuid.uuid4().hex for _ in docs]
+        with profile.stage("build.embed"):
+            if self.store is None:
+                self.store = FAISS.from_documents(
+                    docs, self.embeddings, ids=ids, docstore=SqliteDocWriter(self.stage)
                 )
+            else:
+                self.store.add_documents(docs, ids=ids)
+        with profile.stage("build.rowstore"):
+            self.rows.insert(rows)
+            self.rows.lexical.add(
+                (doc_id, r["path"], r["chunk_id"], doc_text(r["path"], r["content"]))
+                for doc_id, r in zip(ids, rows)
+            )
+            self.rows.commit()
+        self.count += len(rows)
+        profile.count("build.chunks", len(rows))
 
-    
-    # Caption images
-    if img_files:
-        print(f"📸 Captioning {len(img_files)} images …")
-        caps = caption_images(img_files)
-        img_rows = [r for r in rows if r["type"] in SUPPORTED_IMG]
+    def save(
+        self,
+        index_type: str = "flat",
+        encoding: str = "fp32",
+        pca_dim: int = 0,
+        rescore: bool = False,
+    ):
+        if self.store is None:
+            return
 
-        for r, cap in zip(img_rows, caps):
-            r["summary"] = cap
-            r["content"] = cap
-            r["tags"] = clean_words(cap) or clean_words(Path(r["path"]).stem)
+        n = self.store.index.ntotal
+        exact_only = index_type == "flat" and encoding == "fp32" and not pca_dim
+        if not exact_only and n < ANN_MIN_VECTORS:
+            print(f"-> Only {n} vectors, keeping the exact flat index")
+        elif not exact_only:
+            # The flat index's own storage is read in place: at most the exact
+            # vectors and the new index are in memory at once
+            exact = self.store.index
+            vectors = flat_vectors(exact)
+            if encoding != "fp32" or pca_dim:
+                encoding_report(vectors)
+            with profile.stage("build.ann"):
+                ann = build_ann(vectors, index_type, encoding=encoding, pca_dim=pca_dim, rescore=rescore)
+            del vectors
+            tune(ann)
+            recall_report(exact, ann)
+            total = index_bytes(ann)
+            print(
+                f"-> Index: {total / 2**20:.0f} MB ({total / n:.0f} B/vector, "
+                f"{(total - refine_bytes(ann)) / 2**20:.0f} MB resident with --mmap) "
+                f"vs {index_bytes(exact) / 2**20:.0f} MB exact"
+            )
+            self.store.index = ann
+            del exact
 
-    if not rows:
-        raise RuntimeError("No supported files found.")
+        with profile.stage("build.save"):
+            save_store(self.store, self.stage)
 
-    docs = [
-        Document(
-            page_content=r["content"],
-            metadata={
-                k: r[k]
-                for k in (
-                    "path",
-                    "type",
-                    "tags",
-                    "summary",
-                    "chunk_id",
-                    "size",
-                    "mtime",
-                )
-            },
-        )
-        for r in rows
-    ]
 
-    print("Intialize - Embedding & writing FAISS")
-    embeddings = load_embeddings()
-    store = FAISS.from_documents(docs, embeddings)
+#Index Builder Pipeline Module
+def build_index(
+    folder: str,
+    name: str,
+    workers: int = None,
+    index_type: str = ANN_INDEX,
+    encoding: str = ANN_ENCODING,
+    pca_dim: int = ANN_PCA_DIM,
+    rescore: bool = ANN_RESCORE,
+):
+    folder = Path(folder)
+    if not folder.exists():
+        raise RuntimeError(f"Folder not found: {folder}")
+
+    cache = ContentCache()
+    try:
+        with profile.stage("build.total"):
+            _build(folder, name, workers, cache, index_type, encoding, pca_dim, rescore)
+    finally:
+        cache.report()
+        for kind in set(cache.hits) | set(cache.misses):
+            profile.count(f"cache.{kind}.hits", cache.hits[kind])
+            profile.count(f"cache.{kind}.misses", cache.misses[kind])
+        cache.close()
 
+
+def _build(
+    folder: Path,
+    name: str,
+    workers: int,
+    cache: ContentCache,
+    index_type: str,
+    encoding: str,
+    pca_dim: int,
+    rescore: bool,
+):
     out_dir = Path("vector_dbs") / f"{name}_bge_db"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    store.save_local(str(out_dir))
+    stage = stage_index(out_dir, new_version())
+    sink = _IndexSink(stage, CachedEmbeddings(LazyEmbeddings(), cache, model_key(EMBED_MODEL)))
+
+    # Files stream from the walk straight into the extractor; only in-flight
+    # entries and one batch of rows are held in memory at a time
+    in_flight: Dict[Path, Dict] = {}
+    known: Dict[Path, List[str]] = {}
+    hits = set()
+    images: List[Tuple[Path, Dict]] = []
+
+    def text_files():
+        for full, ext, entry_base in profile.timed_iter("build.walk", _walk(folder)):
+            profile.count("build.files")
+            profile.count("build.bytes", entry_base["size"])
+            if ext in SUPPORTED_TEXT:
+                in_flight[full] = entry_base
+                hit = cache.get_text(full, entry_base["size"], entry_base["mtime"])
+                if hit is not None:
+                    known[full] = hit
+                    hits.add(full)
+                yield full
+            else:
+                images.append((full, entry_base))
+
+    # Chunks are summarized in batches that span files
+    pending: List[Dict] = []
+
+    # build.extract includes build.walk (the walk is pulled by the extractor)
+    extracted = iter_chunks(text_files(), workers=workers, known=known)
+    for full, chunks in profile.timed_iter("build.extract", extracted):
+        entry_base = in_flight.pop(full)
+        if full in hits:
+            hits.discard(full)
+            profile.count("build.extract_cached")
+        elif chunks is None:
+            profile.count("build.extract_failed")
+        else:
+            cache.put_text(full, entry_base["size"], entry_base["mtime"], chunks)
+
+        for chunk_id, chunk in enumerate(chunks or []):
+            pending.append(
+                {
+                    **entry_base,
+                    "summary": "",
+                    "content": chunk,
+                    "tags": clean_words(chunk) or clean_words(full.name),
+                    "chunk_id": chunk_id,
+                }
+            )
+
+        if len(pending) >= max(EMBED_BATCH, SUMMARY_BATCH * 4):
+            _flush_summaries(pending, cache)
+            sink.add(pending)
+            pending = []
+
+        if len(images) >= IMAGE_BATCH:
+            print(f"📸 Captioning {len(images)} images …")
+            sink.add(_caption_rows(images, cache))
+            images.clear()
+
+    _flush_summaries(pending, cache)
+    sink.add(pending)
+
+    # Caption images
+    for i in range(0, len(images), IMAGE_BATCH):
+        print(f"📸 Captioning {len(images[i:i+IMAGE_BATCH])} images …")
+        sink.add(_caption_rows(images[i:i+IMAGE_BATCH], cache))
+
+    print("Intialize - Writing FAISS")
+    sink.save(index_type, encoding, pca_dim, rescore)
+
+    if sink.store is None:
+        sink.rows.close()
+        shutil.rmtree(stage, ignore_errors=True)
+        raise RuntimeError("No supported files found.")
 
-    Path("file_indexes").mkdir(exist_ok=True)
-    Path("file_indexes", f"{name}.json").write_text(
-        json.dumps(rows, indent=2)
-    )
+    with profile.stage("build.publish"):
+        publish_index(out_dir, sink.rows, rows_path(name))
+    profile.snapshot("build.done")
 
-    print(f"✅ Index built with {len(rows)} docs → {out_dir}")
+    print(f"✅ Index built with {sink.count} docs → {out_dir}")
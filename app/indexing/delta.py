@@ -1,14 +1,22 @@
-import json
+import os
+from collections import defaultdict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
-from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
-from app.config import SUPPORTED_TEXT, SUPPORTED_IMG
-from app.core.file_extractors import extract_text
-from app.core.text_utils import chunk_text, summarize, clean_words
+from app.config import SUPPORTED_TEXT, SUPPORTED_IMG, EMBED_BATCH
+from app.core.text_utils import summarize_batch, clean_words
 from app.core.image_caption import caption_images
+from app.indexing.parallel import iter_chunks
+from app.indexing.ann import remove_vectors
+from app.indexing.lexical import doc_text
+from app.indexing.loader import load_store, save_store
+from app.indexing.rowstore import RowStore, open_rows, rows_path
+from app.indexing.txn import new_version, stage_index, publish_index, recover_index
+from app.utils import profile
+
 
 # Smart Index Updater (To Update the Existing Index efficiently by Updating the modified files Index only)
 class DeltaIndexer:
@@ -19,129 +27,249 @@ class DeltaIndexer:
         name: str,
         embeddings=None,
         db_dir: Path = None,
-        rows: List[Dict[str, Any]] = None,
+        rows: RowStore = None,
     ):
         self.folder = folder
         self.name = name
         self.embeddings = embeddings
         self.db_dir = db_dir
-        self.rows = rows or []
+        self._ops: Optional[Dict[str, str]] = None
 
-        
-        try:
-            self.store = FAISS.load_local(
-                str(db_dir),
-                embeddings,
-                allow_dangerous_deserialization=True,
-            )
-        except Exception:
-            docs = [
-                Document(
-                    page_content=r["content"],
-                    metadata={k: r[k] for k in r if k != "content"},
-                )
-                for r in self.rows
-            ]
-            self.store = (
-                FAISS.from_documents(docs, embeddings)
-                if docs
-                else FAISS.from_documents([], embeddings)
-            )
+        if recover_index(db_dir, rows_path(name)):
+            print("-> Recovered an interrupted sync")
+        self.rows = rows or open_rows(name)
+        self._load()
 
+    def _load(self):
+        self.store = load_store(self.db_dir, self.embeddings)
 
-    # Index / Re-index single path
-    def _index_path(self, path: Path):
-        ext = path.suffix.lower().lstrip(".")
-        if ext not in SUPPORTED_TEXT and ext not in SUPPORTED_IMG:
+        # path -> (size, mtime) of what is currently indexed
+        self.path_stat: Dict[str, tuple] = self.rows.file_stats()
+
+        # path -> docstore ids, so a file's vectors can be dropped without re-embedding
+        self.path_ids: Dict[str, List[str]] = defaultdict(list)
+        for doc_id in self.store.index_to_docstore_id.values():
+            doc = self.store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                self.path_ids[doc.metadata.get("path")].append(doc_id)
+
+
+    # Batch / transaction API
+    def begin(self):
+        if self._ops is None:
+            self._ops = {}
+
+    def add(self, path: Path):
+        # Also used for modified files: existing rows for the path are replaced
+        self.begin()
+        self._ops[str(path)] = "add"
+
+    def remove(self, path: Path):
+        self.begin()
+        self._ops[str(path)] = "remove"
+
+    def paths_under(self, folder: str) -> List[str]:
+        prefix = str(Path(folder)).rstrip("\\/") + os.sep
+        return [p for p in self.path_stat if p.startswith(prefix)]
+
+    def rollback(self):
+        self._ops = None
+
+    def commit(self):
+        ops, self._ops = self._ops or {}, None
+        if not ops:
             return
 
-        new = []
+        # Extract / summarize / caption before touching the store
+        new = self._build_rows([Path(p) for p, op in sorted(ops.items()) if op == "add"])
 
+        # Row changes stay in one open SQLite transaction until the FAISS files are
+        # staged. On any failure the rows roll back and the store, path_ids and
+        # path_stat are reloaded from the last published index, so nothing is left
+        # half-removed in memory for the next batch to persist.
+        gone = set(ops)
+        ids = [i for p in gone for i in self.path_ids.get(p, [])]
         try:
-            size = path.stat().st_size
-            mtime = int(path.stat().st_mtime)
-        except Exception:
-            size = 0
-            mtime = 0
-
-        if ext in SUPPORTED_TEXT:
-            raw = extract_text(path)[:30000]
-            for cid, chunk in enumerate(chunk_text(raw)):
+            with profile.stage("delta.remove"):
+                if ids:
+                    remove_vectors(self.store, ids)
+                self.rows.delete_paths(gone)
+            for p in gone:
+                self.path_ids.pop(p, None)
+                self.path_stat.pop(p, None)
+
+            added = self._embed_rows(new)
+            with profile.stage("delta.rowstore"):
+                self.rows.insert(new)
+            for r in new:
+                if r["chunk_id"] == 0:
+                    self.path_stat[r["path"]] = (r["size"], r["mtime"])
+
+            with profile.stage("delta.save"):
+                stage = stage_index(self.db_dir, new_version())
+                # Only the changed documents are written into the copied docs.sqlite
+                save_store(self.store, stage, base=self.db_dir, removed=ids, added=added)
+                publish_index(self.db_dir, self.rows, rows_path(self.name))
+        except BaseException:
+            self.rows.rollback()
+            # A failure after the row store committed is rolled forward here
+            recover_index(self.db_dir, rows_path(self.name))
+            self._load()
+            raise
+        profile.count("delta.chunks", len(new))
+        profile.count("delta.removed_vectors", len(ids))
+        profile.snapshot("delta.done")
+
+    def sync(self, verbose: bool = False) -> Tuple[int, int, int]:
+        # Walk self.folder, diff (size, mtime) against the index and apply it as one batch
+        curr = {}
+        with profile.stage("delta.scan"):
+            for r, _, fns in os.walk(self.folder):
+                for fn in fns:
+                    ext = Path(fn).suffix.lower().lstrip(".")
+                    if ext in SUPPORTED_TEXT or ext in SUPPORTED_IMG:
+                        p = Path(r) / fn
+                        try:
+                            stat = p.stat()
+                            curr[str(p)] = (stat.st_size, int(stat.st_mtime))
+                        except Exception:
+                            curr[str(p)] = (0, 0)
+
+        idx_map = self.path_stat
+
+        to_add = set(curr) - set(idx_map)
+        to_delete = set(idx_map) - set(curr)
+        to_mod = {p for p in (set(curr) & set(idx_map)) if curr[p] != idx_map[p]}
+
+        # Queue everything, then embed in batches and write the index once
+        with self.batch():
+            for p in sorted(to_delete):
+                if verbose:
+                    print(f"-> Removing {p}")
+                self.remove(Path(p))
+
+            for p in sorted(to_mod):
+                if verbose:
+                    print(f"-> Re-indexing {p}")
+                self.add(Path(p))
+
+            for p in sorted(to_add):
+                if verbose:
+                    print(f"-> Adding {p}")
+                self.add(Path(p))
+
+        profile.count("delta.added", len(to_add))
+        profile.count("delta.modified", len(to_mod))
+        profile.count("delta.deleted", len(to_delete))
+        return len(to_add), len(to_mod), len(to_delete)
+
+    @contextmanager
+    def batch(self):
+        if self._ops is not None:
+            # Nested: the outer batch commits
+            yield self
+            return
+
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+
+    def _build_rows(self, paths: List[Path]) -> List[Dict[str, Any]]:
+        new: List[Dict[str, Any]] = []
+        images: List[Dict[str, Any]] = []
+        stats = {}
+
+        for path in paths:
+            try:
+                st = path.stat()
+                stats[path] = (st.st_size, int(st.st_mtime))
+            except Exception:
+                stats[path] = (0, 0)
+
+        texts = [p for p in paths if p.suffix.lower().lstrip(".") in SUPPORTED_TEXT]
+        for path, chunks in profile.timed_iter("delta.extract", iter_chunks(texts)):
+            profile.count("delta.files")
+            profile.count("delta.bytes", stats[path][0])
+            size, mtime = stats[path]
+            for cid, chunk in enumerate(chunks or []):
                 new.append(
                     {
                         "path": str(path),
-                        "type": ext,
+                        "type": path.suffix.lower().lstrip("."),
                         "chunk_id": cid,
                         "content": chunk,
-                        "summary": summarize(chunk),
+                        "summary": "",
                         "tags": clean_words(chunk) or clean_words(path.stem),
                         "size": size,
                         "mtime": mtime,
                     }
                 )
-        else:
-            cap = caption_images([path])[0]
-            new.append(
+
+        with profile.stage("delta.summarize"):
+            summaries = summarize_batch([r["content"] for r in new])
+        for r, summary in zip(new, summaries):
+            r["summary"] = summary
+
+        imgs = [p for p in paths if p.suffix.lower().lstrip(".") in SUPPORTED_IMG]
+        with profile.stage("delta.caption"):
+            caps = caption_images(imgs)
+        profile.count("delta.images", len(imgs))
+        for path, cap in zip(imgs, caps):
+            size, mtime = stats[path]
+            images.append(
                 {
                     "path": str(path),
-                    "type": ext,
+                    "type": path.suffix.lower().lstrip("."),
                     "chunk_id": 0,
-                    "content": cap,
+                    "content": cap or path.stem,
                     "summary": cap,
-                    "tags": clean_words(cap),
+                    "tags": clean_words(cap) or clean_words(path.stem),
                     "size": size,
                     "mtime": mtime,
                 }
             )
 
+        return new + images
+
+    def _embed_rows(self, rows: List[Dict[str, Any]]) -> List[str]:
         docs = [
             Document(
                 page_content=r["content"],
                 metadata={k: r[k] for k in r if k != "content"},
             )
-            for r in new
+            for r in rows
         ]
 
-        if docs:
-            self.store.add_documents(docs)
-
-       
-        self.rows = [r for r in self.rows if r["path"] != str(path)] + new
+        added = []
+        for i in range(0, len(docs), EMBED_BATCH):
+            part = docs[i:i+EMBED_BATCH]
+            with profile.stage("delta.embed"):
+                ids = self.store.add_documents(part)
+            added += ids
+            for d, doc_id in zip(part, ids):
+                self.path_ids[d.metadata["path"]].append(doc_id)
+            with profile.stage("delta.rowstore"):
+                self.rows.lexical.add(
+                    (doc_id, d.metadata["path"], d.metadata["chunk_id"], doc_text(d.metadata["path"], d.page_content))
+                    for d, doc_id in zip(part, ids)
+                )
+        return added
 
-        Path("file_indexes").mkdir(exist_ok=True)
-        Path("file_indexes", f"{self.name}.json").write_text(
-            json.dumps(self.rows, indent=2)
-        )
 
-        out = Path(self.db_dir)
-        out.mkdir(parents=True, exist_ok=True)
-        self.store.save_local(str(out))
+    # Single-path helpers (each one is its own transaction)
+    def _index_path(self, path: Path):
+        ext = path.suffix.lower().lstrip(".")
+        if ext not in SUPPORTED_TEXT and ext not in SUPPORTED_IMG:
+            return
 
+        with self.batch():
+            self.add(path)
 
     def _remove_path(self, path: Path):
-        p = str(path)
-
-        self.rows = [r for r in self.rows if r["path"] != p]
-
-        docs = [
-            Document(
-                page_content=r["content"],
-                metadata={k: r[k] for k in r if k != "content"},
-            )
-            for r in self.rows
-        ]
-
-        self.store = (
-            FAISS.from_documents(docs, self.embeddings)
-            if docs
-            else FAISS.from_documents([], self.embeddings)
-        )
-
-        Path("file_indexes").mkdir(exist_ok=True)
-        Path("file_indexes", f"{self.name}.json").write_text(
-            json.dumps(self.rows, indent=2)
-        )
-
-        out = Path(self.db_dir)
-        out.mkdir(parents=True, exist_ok=True)
-        self.store.save_local(str(out))
+        with self.batch():
+            self.remove(path)
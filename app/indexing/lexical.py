@@ -0,0 +1,149 @@
+import math
+import os
+import re
+import sqlite3
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from app.config import BM25_K1, BM25_B, LEXICAL_MAX_DF
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    # Whole identifiers (getUserName, user_id, report.pdf -> report, pdf) plus their parts
+    out: List[str] = []
+    for tok in _TOKEN_RE.findall(text or ""):
+        low = tok.lower()
+        out.append(low)
+        parts = [p.lower() for piece in tok.split("_") for p in _CAMEL_RE.findall(piece)]
+        if len(parts) > 1:
+            out += [p for p in parts if len(p) > 1 and p != low]
+    return out
+
+
+def doc_text(path: str, content: str) -> str:
+    # File names are searchable too (report_2023.pdf, utils.py)
+    return f"{content} {os.path.basename(path)}"
+
+
+# BM25 inverted index stored in the row store's SQLite file (shares its transaction)
+class LexicalIndex:
+
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS lex_docs (
+                doc      INTEGER PRIMARY KEY,
+                doc_id   TEXT,
+                path     TEXT,
+                chunk_id INTEGER,
+                len      INTEGER,
+                terms    TEXT
+            );
+            CREATE INDEX IF NOT EXISTS lex_docs_path ON lex_docs(path);
+            CREATE TABLE IF NOT EXISTS lex_postings (
+                term TEXT, doc INTEGER, tf INTEGER, len INTEGER, PRIMARY KEY (term, doc)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS lex_terms (
+                term TEXT PRIMARY KEY, df INTEGER
+            ) WITHOUT ROWID;
+            """
+        )
+        self._stats = None
+
+    def add(self, items: Iterable[Tuple[str, str, int, str]]):
+        # items: (docstore id, path, chunk_id, text)
+        for doc_id, path, chunk_id, text in items:
+            tf = Counter(tokenize(text))
+            dl = sum(tf.values())
+            cur = self.db.execute(
+                "INSERT INTO lex_docs (doc_id, path, chunk_id, len, terms) VALUES (?, ?, ?, ?, ?)",
+                (doc_id, path, chunk_id, dl, " ".join(tf)),
+            )
+            doc = cur.lastrowid
+            # Document length is repeated per posting so scoring never leaves the term's range
+            self.db.executemany(
+                "INSERT INTO lex_postings (term, doc, tf, len) VALUES (?, ?, ?, ?)",
+                ((t, doc, n, dl) for t, n in tf.items()),
+            )
+            self.db.executemany(
+                "INSERT INTO lex_terms (term, df) VALUES (?, 1) "
+                "ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                ((t,) for t in tf),
+            )
+        self._stats = None
+
+    def delete_paths(self, paths: Iterable[str]):
+        for path in paths:
+            docs = self.db.execute(
+                "SELECT doc, terms FROM lex_docs WHERE path=?", (path,)
+            ).fetchall()
+            for doc, terms in docs:
+                terms = terms.split()
+                self.db.executemany(
+                    "DELETE FROM lex_postings WHERE term=? AND doc=?",
+                    ((t, doc) for t in terms),
+                )
+                self.db.executemany(
+                    "UPDATE lex_terms SET df = df - 1 WHERE term=?",
+                    ((t,) for t in terms),
+                )
+            self.db.execute("DELETE FROM lex_docs WHERE path=?", (path,))
+        self.db.execute("DELETE FROM lex_terms WHERE df <= 0")
+        self._stats = None
+
+    def stats(self) -> Tuple[int, float]:
+        if self._stats is None:
+            n, avg = self.db.execute("SELECT COUNT(*), AVG(len) FROM lex_docs").fetchone()
+            self._stats = (n, avg or 0.0)
+        return self._stats
+
+    def doc_freqs(self, terms: Iterable[str]) -> Dict[str, int]:
+        out = {}
+        for term in terms:
+            row = self.db.execute("SELECT df FROM lex_terms WHERE term=?", (term,)).fetchone()
+            if row is not None:
+                out[term] = row[0]
+        return out
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        stats: Tuple[int, float, Dict[str, int]] = None,
+    ) -> List[Tuple[str, str, int, float]]:
+        # -> [(docstore id, path, chunk_id, bm25)], best first
+        # stats: (docs, avg length, {term: df}) summed over several indexes, so
+        # their BM25 scores are comparable (federated search)
+        terms = set(tokenize(query))
+        n, avgdl, dfs = stats or (*self.stats(), self.doc_freqs(terms))
+        if not n:
+            return []
+
+        # (term, idf) for the query terms worth scoring; terms in more than
+        # LEXICAL_MAX_DF of all chunks carry almost no weight and would dominate the scan
+        weights = []
+        for term in terms:
+            df = dfs.get(term)
+            if df is None or df > LEXICAL_MAX_DF * n:
+                continue
+            weights += [term, math.log(1 + (n - df + 0.5) / (df + 0.5))]
+        if not weights:
+            return []
+
+        # One primary-key range scan per term, summed and ranked inside SQLite;
+        # lex_docs is only read for the k winners
+        q = ", ".join(["(?, ?)"] * (len(weights) // 2))
+        return self.db.execute(
+            f"WITH q(term, idf) AS (VALUES {q}), top AS ("
+            "SELECT p.doc AS doc, "
+            "SUM(q.idf * p.tf * (? + 1) / (p.tf + ? * (1 - ? + ? * p.len / ?))) AS score "
+            "FROM q JOIN lex_postings p ON p.term = q.term "
+            "GROUP BY p.doc ORDER BY score DESC, p.doc LIMIT ?) "
+            "SELECT d.doc_id, d.path, d.chunk_id, top.score "
+            "FROM top JOIN lex_docs d ON d.doc = top.doc ORDER BY top.score DESC, top.doc",
+            (*weights, BM25_K1, BM25_K1, BM25_B, BM25_B, avgdl, k),
+        ).fetchall()
@@ -0,0 +1,209 @@
+import json
+import shutil
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, List, Union
+
+import faiss
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from app.indexing.ann import load_tombstones, save_tombstones, tune
+
+DOCS_FILE = "docs.sqlite"
+
+
+def _create_docs(db):
+    db.executescript(
+        """
+        CREATE TABLE docs (doc_id TEXT PRIMARY KEY, content TEXT, metadata TEXT);
+        CREATE TABLE ids (pos INTEGER PRIMARY KEY, doc_id TEXT);
+        """
+    )
+
+
+def _doc_rows(store: FAISS, doc_ids: Iterable[str]):
+    for doc_id in doc_ids:
+        doc = store.docstore.search(doc_id)
+        if isinstance(doc, Document):
+            yield doc_id, doc.page_content, json.dumps(doc.metadata)
+
+
+class SqliteDocWriter(Docstore, AddableMixin):
+    # Build-time docstore: documents go straight into the staged docs.sqlite,
+    # so only ids and vectors stay in memory while an index is built
+
+    def __init__(self, folder: Path):
+        self.path = Path(folder) / DOCS_FILE
+        self.path.unlink(missing_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        _create_docs(self.db)
+
+    def add(self, texts: Dict[str, Document]):
+        self.db.executemany(
+            "INSERT INTO docs VALUES (?, ?, ?)",
+            ((doc_id, d.page_content, json.dumps(d.metadata)) for doc_id, d in texts.items()),
+        )
+        self.db.commit()
+
+    def delete(self, ids: List):
+        self.db.executemany("DELETE FROM docs WHERE doc_id=?", ((i,) for i in ids))
+        self.db.commit()
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self.db.execute("SELECT content, metadata FROM docs WHERE doc_id=?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+
+def save_store(store: FAISS, folder: Path, base: Path = None, removed: Iterable[str] = (), added: List[str] = None):
+    # index.faiss + docs.sqlite (documents and the position -> id map); no pickled docstore.
+    # With `base` (the live index dir) and `added`, base's docs.sqlite is copied and
+    # only the removed / added documents are written; the id map is always rewritten.
+    folder = Path(folder)
+    faiss.write_index(store.index, str(folder / "index.faiss"))
+    save_tombstones(store, folder)
+
+    path = folder / DOCS_FILE
+    if isinstance(store.docstore, SqliteDocWriter) and store.docstore.path == path:
+        # Documents were written as they were added
+        db = store.docstore.db
+        _write_ids(db, store)
+        return
+
+    path.unlink(missing_ok=True)
+    src = Path(base) / DOCS_FILE if base is not None else None
+    if added is not None and src is not None and src.exists():
+        shutil.copyfile(src, path)
+        db = sqlite3.connect(str(path))
+        db.executemany("DELETE FROM docs WHERE doc_id=?", ((i,) for i in removed))
+        db.executemany("INSERT OR REPLACE INTO docs VALUES (?, ?, ?)", _doc_rows(store, added))
+        db.execute("DELETE FROM ids")
+    else:
+        db = sqlite3.connect(str(path))
+        _create_docs(db)
+        db.executemany("INSERT INTO docs VALUES (?, ?, ?)", _doc_rows(store, store.index_to_docstore_id.values()))
+
+    _write_ids(db, store)
+
+
+def _write_ids(db, store: FAISS):
+    db.executemany("INSERT INTO ids VALUES (?, ?)", store.index_to_docstore_id.items())
+    db.commit()
+    db.close()
+
+
+def _read_docs(path: Path):
+    # Whole docs.sqlite into memory (the writable / non-mmap docstore)
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        docs = {
+            doc_id: Document(page_content=content, metadata=json.loads(meta))
+            for doc_id, content, meta in db.execute("SELECT doc_id, content, metadata FROM docs")
+        }
+        ids = dict(db.execute("SELECT pos, doc_id FROM ids"))
+    finally:
+        db.close()
+    return InMemoryDocstore(docs), ids
+
+
+class _DocsDB:
+    # One read-only connection shared across threads
+
+    def __init__(self, path: Path):
+        self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    def one(self, sql: str, args=()):
+        with self.lock:
+            return self.db.execute(sql, args).fetchone()
+
+
+class SqliteDocstore(Docstore):
+
+    def __init__(self, docs: _DocsDB):
+        self.docs = docs
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self.docs.one("SELECT content, metadata FROM docs WHERE doc_id=?", (search,))
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+
+class _LazyIds(Mapping):
+    # FAISS position -> docstore id, looked up on demand
+
+    def __init__(self, docs: _DocsDB):
+        self.docs = docs
+        self.n = docs.one("SELECT COUNT(*) FROM ids")[0]
+
+    def __getitem__(self, pos):
+        row = self.docs.one("SELECT doc_id FROM ids WHERE pos=?", (int(pos),))
+        if row is None:
+            raise KeyError(pos)
+        return row[0]
+
+    def __iter__(self):
+        return iter(range(self.n))
+
+    def __len__(self):
+        return self.n
+
+
+def _read_index_mmap(path: Path):
+    base = faiss.IO_FLAG_READ_ONLY | faiss.IO_FLAG_MMAP
+    ifc = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if ifc is not None:
+        try:
+            return faiss.read_index(str(path), base | ifc)
+        except RuntimeError:
+            pass
+    # IO_FLAG_MMAP only maps IVF inverted lists; flat codes are copied into RAM
+    print(f"⚠️ faiss build cannot map {path.name} fully (no IO_FLAG_MMAP_IFC) – flat vectors load into RAM.")
+    try:
+        return faiss.read_index(str(path), base)
+    except RuntimeError:
+        return faiss.read_index(str(path))
+
+
+def load_store(
+    db_dir: Path,
+    embeddings,
+    mmap: bool = False,
+    nprobe: int = None,
+    ef_search: int = None,
+) -> FAISS:
+    # mmap=True: vectors are mapped from index.faiss (shared page cache across
+    # processes) and documents are read from docs.sqlite on demand. Read-only.
+    db_dir = Path(db_dir)
+    if mmap and (db_dir / DOCS_FILE).exists():
+        docs = _DocsDB(db_dir / DOCS_FILE)
+        store = FAISS(
+            embeddings,
+            _read_index_mmap(db_dir / "index.faiss"),
+            SqliteDocstore(docs),
+            _LazyIds(docs),
+        )
+    else:
+        if mmap:
+            print(f"No {DOCS_FILE} in {db_dir} (built before read-only loading) – loading normally.")
+        if (db_dir / "index.pkl").exists():
+            # Indexes saved before docs.sqlite replaced the pickled docstore
+            store = FAISS.load_local(
+                str(db_dir),
+                embeddings,
+                allow_dangerous_deserialization=True,
+            )
+        else:
+            docstore, ids = _read_docs(db_dir / DOCS_FILE)
+            store = FAISS(embeddings, faiss.read_index(str(db_dir / "index.faiss")), docstore, ids)
+
+    tune(store.index, nprobe=nprobe, ef_search=ef_search)
+    load_tombstones(store, db_dir)
+    return store
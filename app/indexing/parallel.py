@@ -0,0 +1,114 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import EXTRACT_WORKERS, EXTRACT_TIMEOUT
+from app.core.file_extractors import extract_text
+from app.core.text_utils import chunk_text
+
+
+# Runs inside the worker processes: parse one file and split it into chunks
+def extract_chunks(path: Path) -> List[str]:
+    raw = extract_text(path)
+    if not raw.strip():
+        return []
+    return chunk_text(raw)
+
+
+def _kill_pool(pool: ProcessPoolExecutor):
+    # shutdown() alone waits on a worker stuck inside a parser, so terminate them
+    procs = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for proc in procs:
+        try:
+            if proc.is_alive():
+                proc.terminate()
+        except Exception:
+            pass
+
+
+# Extraction Stage (fans files out to a process pool, yields results in input order)
+# `paths` is consumed lazily; `known` holds chunks already available (e.g. cache hits)
+def iter_chunks(
+    paths: Iterable[Path],
+    workers: int = None,
+    timeout: float = None,
+    known: Dict[Path, List[str]] = None,
+) -> Iterator[Tuple[Path, Optional[List[str]]]]:
+    workers = EXTRACT_WORKERS if workers is None else workers
+    timeout = EXTRACT_TIMEOUT if timeout is None else timeout
+    known = {} if known is None else known
+    source = iter(paths)
+
+    if workers <= 1:
+        for p in source:
+            yield p, known.pop(p) if p in known else extract_chunks(p)
+        return
+
+    retries = deque()
+    window = deque()
+    strikes = {}
+    isolate = False
+    pool = ProcessPoolExecutor(max_workers=workers)
+
+    try:
+        while True:
+            limit = 1 if isolate else workers * 4
+            while len(window) < limit:
+                p = retries.popleft() if retries else next(source, None)
+                if p is None:
+                    break
+                if p in known:
+                    fut = Future()
+                    fut.set_result(known.pop(p))
+                else:
+                    try:
+                        fut = pool.submit(extract_chunks, p)
+                    except BrokenProcessPool as e:
+                        fut = Future()
+                        fut.set_exception(e)
+                window.append((p, fut))
+
+            if not window:
+                break
+
+            p, fut = window.popleft()
+            retry = False
+            try:
+                chunks = fut.result(timeout=timeout)
+            except FutureTimeout:
+                print(f"⚠️ Extraction timed out after {timeout}s, skipping: {p}")
+                yield p, None
+            except BrokenProcessPool:
+                # Any queued file may have killed the worker; retry the head alone once
+                strikes[p] = strikes.get(p, 0) + 1
+                if strikes[p] >= 2:
+                    print(f"⚠️ Extractor crashed, skipping: {p}")
+                    yield p, None
+                    isolate = False
+                else:
+                    retry = True
+                    isolate = True
+            except Exception as e:
+                print(f"⚠️ Extraction failed, skipping: {p} ({e})")
+                yield p, None
+                continue
+            else:
+                isolate = False
+                yield p, chunks
+                continue
+
+            # Pool is hung or broken: rebuild it and resubmit everything in flight
+            for q, f in reversed(window):
+                if f.done() and not f.cancelled() and f.exception() is None:
+                    known[q] = f.result()
+                retries.appendleft(q)
+            if retry:
+                retries.appendleft(p)
+            window.clear()
+            _kill_pool(pool)
+            pool = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        _kill_pool(pool)
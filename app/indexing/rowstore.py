@@ -0,0 +1,160 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.indexing.lexical import LexicalIndex
+
+# Columns kept per chunk; the chunk text itself lives only in the FAISS docstore
+COLUMNS = ("path", "chunk_id", "type", "size", "mtime", "tags", "summary")
+
+
+def rows_path(name: str) -> Path:
+    return Path("file_indexes", f"{name}.sqlite")
+
+
+def legacy_json(name: str) -> Path:
+    return Path("file_indexes", f"{name}.json")
+
+
+def has_rows(name: str) -> bool:
+    return rows_path(name).exists() or legacy_json(name).exists()
+
+
+# Row metadata store (SQLite, indexed by path / type / mtime)
+class RowStore:
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS rows (
+                path     TEXT NOT NULL,
+                chunk_id INTEGER NOT NULL,
+                type     TEXT,
+                size     INTEGER,
+                mtime    INTEGER,
+                tags     TEXT,
+                summary  TEXT,
+                PRIMARY KEY (path, chunk_id)
+            );
+            CREATE INDEX IF NOT EXISTS rows_type  ON rows(type);
+            CREATE INDEX IF NOT EXISTS rows_mtime ON rows(mtime);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self.lexical = LexicalIndex(self.db)
+
+    def insert(self, rows: Iterable[Dict[str, Any]]):
+        self.db.executemany(
+            f"INSERT OR REPLACE INTO rows ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    r["path"],
+                    r.get("chunk_id", 0),
+                    r.get("type", ""),
+                    r.get("size", 0),
+                    r.get("mtime", 0),
+                    json.dumps(r.get("tags", [])),
+                    r.get("summary", ""),
+                )
+                for r in rows
+            ),
+        )
+
+    def delete_paths(self, paths: Iterable[str]):
+        paths = list(paths)
+        self.db.executemany("DELETE FROM rows WHERE path=?", ((p,) for p in paths))
+        self.lexical.delete_paths(paths)
+
+    def file_stats(self) -> Dict[str, Tuple[int, int]]:
+        # path -> (size, mtime), one entry per indexed file
+        cur = self.db.execute("SELECT path, size, mtime FROM rows WHERE chunk_id=0")
+        return {p: (size, mtime) for p, size, mtime in cur}
+
+    def rows_for(self, path: str) -> List[Dict[str, Any]]:
+        cur = self.db.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM rows WHERE path=? ORDER BY chunk_id",
+            (path,),
+        )
+        out = []
+        for values in cur:
+            r = dict(zip(COLUMNS, values))
+            r["tags"] = json.loads(r["tags"] or "[]")
+            out.append(r)
+        return out
+
+    def count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    @property
+    def version(self) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+        return row[0] if row else None
+
+    @version.setter
+    def version(self, value: str):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (value,))
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+_local = threading.local()
+
+
+def thread_rows(name: str) -> RowStore:
+    # Read-side RowStore for the calling thread (SQLite connections are per thread)
+    stores = getattr(_local, "stores", None)
+    if stores is None:
+        stores = _local.stores = {}
+    rows = stores.get(name)
+    if rows is None:
+        rows = stores[name] = RowStore(rows_path(name))
+    return rows
+
+
+def read_version(path: Path) -> Optional[str]:
+    if not Path(path).exists():
+        return None
+    store = RowStore(path)
+    try:
+        return store.version
+    finally:
+        store.close()
+
+
+def migrate_json(json_path: Path, db_path: Path, batch: int = 5000) -> int:
+    # One-time conversion of the old file_indexes/<name>.json sidecar
+    rows = json.loads(Path(json_path).read_text())
+    tmp = Path(str(db_path) + ".tmp")
+    tmp.unlink(missing_ok=True)
+
+    store = RowStore(tmp)
+    for i in range(0, len(rows), batch):
+        store.insert(rows[i:i+batch])
+    store.version = "migrated"
+    store.close()
+
+    tmp.replace(db_path)
+    return len(rows)
+
+
+def open_rows(name: str) -> RowStore:
+    path = rows_path(name)
+    legacy = legacy_json(name)
+    if not path.exists() and legacy.exists():
+        print(f"-> Migrating {legacy} to {path} …")
+        n = migrate_json(legacy, path)
+        print(f"   {n} rows migrated (the JSON file is no longer read)")
+    return RowStore(path)
@@ -0,0 +1,91 @@
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Tuple
+
+from app.indexing.rowstore import RowStore, read_version
+
+ROWS_FILE = "rows.sqlite"
+VERSION_FILE = "VERSION"
+
+
+# Two-phase commit of <db_dir> + the row store
+# FAISS files are staged in <db_dir>.new together with a VERSION stamp. The commit
+# point is the row store taking that version: either a staged rows.sqlite replacing
+# the live one (full build) or the live store committing its open transaction (delta).
+def _staging(db_dir: Path) -> Tuple[Path, Path]:
+    db_dir = Path(db_dir)
+    return db_dir.with_name(db_dir.name + ".new"), db_dir.with_name(db_dir.name + ".old")
+
+
+def _swap(db_dir: Path):
+    new, old = _staging(db_dir)
+    db_dir = Path(db_dir)
+
+    if db_dir.exists():
+        shutil.rmtree(old, ignore_errors=True)
+        db_dir.rename(old)
+    new.rename(db_dir)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def new_version() -> str:
+    return uuid.uuid4().hex
+
+
+def index_version(db_dir: Path) -> str:
+    # Changes on every build / delta commit; older indexes fall back to the file mtime
+    db_dir = Path(db_dir)
+    try:
+        return (db_dir / VERSION_FILE).read_text().strip()
+    except OSError:
+        pass
+    try:
+        return f"mtime-{(db_dir / 'index.faiss').stat().st_mtime_ns}"
+    except OSError:
+        return "unknown"
+
+
+def stage_index(db_dir: Path, version: str) -> Path:
+    # Fresh staging dir; save the FAISS index here, then publish_index()
+    new, _ = _staging(db_dir)
+    shutil.rmtree(new, ignore_errors=True)
+    new.mkdir(parents=True)
+    (new / VERSION_FILE).write_text(version)
+    return new
+
+
+def publish_index(db_dir: Path, rows: RowStore, rows_file: Path):
+    new, _ = _staging(db_dir)
+    version = (new / VERSION_FILE).read_text()
+    staged_rows = new / ROWS_FILE
+
+    rows.version = version
+    if rows.path == staged_rows:
+        rows.close()
+        Path(rows_file).parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staged_rows, rows_file)
+    else:
+        rows.commit()
+
+    _swap(db_dir)
+
+
+def recover_index(db_dir: Path, rows_file: Path) -> bool:
+    # Finish (or discard) a commit interrupted by a crash; True if anything was rolled forward
+    new, old = _staging(db_dir)
+    applied = False
+
+    if new.exists():
+        staged = (new / VERSION_FILE).read_text() if (new / VERSION_FILE).exists() else None
+        if staged and not (new / ROWS_FILE).exists() and read_version(rows_file) == staged:
+            _swap(db_dir)
+            applied = True
+        else:
+            shutil.rmtree(new, ignore_errors=True)
+
+    if not Path(db_dir).exists() and old.exists():
+        old.rename(db_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return applied
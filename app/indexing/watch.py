@@ -0,0 +1,170 @@
+import os
+import queue
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+from app.config import (
+    SUPPORTED_TEXT,
+    SUPPORTED_IMG,
+    WATCH_DEBOUNCE,
+    WATCH_INTERVAL,
+    WATCH_BATCH_MAX,
+    WATCH_QUEUE_MAX,
+    WATCH_RETRY_DELAY,
+    WATCH_RETRY_MAX,
+    WATCH_RETRY_LIMIT,
+)
+from app.indexing.delta import DeltaIndexer
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except Exception:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+def _supported(path: str) -> bool:
+    ext = Path(path).suffix.lower().lstrip(".")
+    return ext in SUPPORTED_TEXT or ext in SUPPORTED_IMG
+
+
+class _EventQueue(FileSystemEventHandler):
+    # Runs on the observer thread; put() blocks when the queue is full (backpressure)
+
+    def __init__(self, events: queue.Queue):
+        self.events = events
+
+    def on_any_event(self, event):
+        kind = event.event_type
+        if kind == "moved":
+            self._put("remove", event.src_path, event.is_directory)
+            self._put("add", event.dest_path, event.is_directory)
+        elif kind == "deleted":
+            self._put("remove", event.src_path, event.is_directory)
+        elif kind == "created" or (kind == "modified" and not event.is_directory):
+            self._put("add", event.src_path, event.is_directory)
+
+    def _put(self, op: str, path, is_dir: bool):
+        path = os.fsdecode(path)
+        if is_dir or _supported(path):
+            self.events.put((op, path, is_dir))
+
+
+def _apply(handler: DeltaIndexer, ops: Dict[str, Tuple[str, bool]]) -> int:
+    # Turn the net op per path into indexer calls; returns how many files changed
+    changed = 0
+    with handler.batch():
+        for path, (op, is_dir) in sorted(ops.items()):
+            if is_dir:
+                if op == "remove":
+                    for p in handler.paths_under(path):
+                        handler.remove(Path(p))
+                        changed += 1
+                else:
+                    # A directory moved/copied in: only its own subtree is scanned
+                    for root, _, fns in os.walk(path):
+                        for fn in fns:
+                            if _supported(fn):
+                                handler.add(Path(root) / fn)
+                                changed += 1
+                continue
+
+            p = Path(path)
+            try:
+                st = p.stat()
+                current = (st.st_size, int(st.st_mtime))
+            except OSError:
+                current = None
+
+            if current is None:
+                if path in handler.path_stat:
+                    print(f"-> Removing {path}")
+                    handler.remove(p)
+                    changed += 1
+            elif handler.path_stat.get(path) != current:
+                print(f"-> Indexing {path}")
+                handler.add(p)
+                changed += 1
+
+    return changed
+
+
+# Live watch mode (filesystem events -> debounced, coalesced DeltaIndexer batches)
+def watch(
+    folder: str,
+    handler: DeltaIndexer,
+    debounce: float = WATCH_DEBOUNCE,
+    interval: float = WATCH_INTERVAL,
+    max_batch: int = WATCH_BATCH_MAX,
+):
+    if Observer is None:
+        print("watchdog not available.")
+        return
+
+    events: queue.Queue = queue.Queue(maxsize=WATCH_QUEUE_MAX)
+    observer = Observer()
+    observer.schedule(_EventQueue(events), str(folder), recursive=True)
+    observer.start()
+
+    # path -> (net op, is_dir, last event time); later events overwrite earlier ones
+    pending: Dict[str, Tuple[str, bool, float]] = {}
+    # path -> failed attempts, for ops requeued after a failed batch
+    attempts: Dict[str, int] = {}
+
+    print(f"👀 Watching {folder} (Ctrl+C to stop)")
+    try:
+        while True:
+            deadline = time.monotonic() + interval
+            while len(pending) < WATCH_QUEUE_MAX:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    op, path, is_dir = events.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending[path] = (op, is_dir, time.monotonic())
+                attempts.pop(path, None)
+            else:
+                # Too many paths in flight: leave events queued so the observer blocks
+                time.sleep(max(0.0, deadline - time.monotonic()))
+
+            now = time.monotonic()
+            ready = [p for p, (_, _, t) in pending.items() if now - t >= debounce]
+            if not ready:
+                continue
+
+            ops = {}
+            for p in ready[:max_batch]:
+                op, is_dir, _ = pending.pop(p)
+                ops[p] = (op, is_dir)
+
+            try:
+                changed = _apply(handler, ops)
+                if changed:
+                    print(f"✅ Synced {changed} change(s)")
+                for p in ops:
+                    attempts.pop(p, None)
+            except Exception as e:
+                # The indexer rolled back; retry the batch later unless a newer event
+                # for the path arrived meanwhile
+                tries = max(attempts.get(p, 0) for p in ops) + 1
+                if tries > WATCH_RETRY_LIMIT:
+                    print(f"⚠️ Sync batch failed {tries - 1} times, dropping {len(ops)} change(s):", e)
+                    for p in ops:
+                        attempts.pop(p, None)
+                    continue
+                delay = min(WATCH_RETRY_MAX, WATCH_RETRY_DELAY * 2 ** (tries - 1))
+                print(f"⚠️ Sync batch failed, retrying {len(ops)} change(s) in {delay:.0f}s:", e)
+                retry_at = time.monotonic() + delay - debounce
+                for p, (op, is_dir) in ops.items():
+                    if p not in pending:
+                        pending[p] = (op, is_dir, retry_at)
+                        attempts[p] = tries
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
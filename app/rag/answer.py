@@ -1,11 +1,29 @@
+import time
 from pathlib import Path
-from typing import List, Any
+from typing import Iterator, List, Any
 
-from app.rag.llm import _safe_llm_call
-from app.utils.misc import looks_like_gibberish
+from app.config import LLM_MAX_TOKENS, GIBBERISH_CHECK_CHARS
+from app.rag.llm import _safe_llm_call, _safe_llm_acall, _safe_llm_stream
+from app.rag.answer_cache import AnswerCache
+from app.utils.misc import looks_like_gibberish, partial_gibberish
+from app.utils import profile
 
 
-def generate_answer_with_llm(llm_obj, question: str, hits: List[Any]) -> str:
+class AnswerAborted(RuntimeError):
+    # Streaming answer cancelled because the partial output looked like gibberish
+    pass
+
+
+def _fallback(parts) -> str:
+    lines = [
+        f"• {p['path']} — {p['summary'] or p['excerpt'][:120]}"
+        for p in parts[:5]
+    ]
+    return "Here are the most relevant files:\n" + "\n".join(lines)
+
+
+def _prepare(question: str, hits: List[Any]):
+    # -> (parts, direct answer or None, LLM prompt or None)
     q_lower = question.lower()
     wants_summary = any(
         k in q_lower
@@ -45,7 +63,7 @@ def generate_answer_with_llm(llm_obj, question: str, hits: List[Any]) -> str:
                 name = Path(p["path"]).name
                 desc = p["summary"].capitalize() if p["summary"] else "An image file."
                 response_lines.append(f"🖼️ {name}: {desc}")
-        return "\n".join(response_lines) + "\n---"
+        return parts, "\n".join(response_lines) + "\n---", None
 
     #Context Builder
     context_blocks = []
@@ -90,12 +108,118 @@ def generate_answer_with_llm(llm_obj, question: str, hits: List[Any]) -> str:
         f"Answer naturally:"
     )
 
+    return parts, None, prompt
+
+
+def generate_answer_with_llm(
+    llm_obj,
+    question: str,
+    hits: List[Any],
+    cache: AnswerCache = None,
+    version: str = None,
+) -> str:
+    if cache is not None:
+        cached = cache.get(question, hits, version)
+        if cached is not None:
+            profile.count("answer.cache_hits")
+            return cached
+
+    parts, direct, prompt = _prepare(question, hits)
+    if direct is not None:
+        return direct
+
+    try:
+        with profile.stage("answer.llm"):
+            resp_text = _safe_llm_call(llm_obj, prompt).strip()
+        profile.count("answer.chars", len(resp_text))
+        if cache is not None and not looks_like_gibberish(resp_text):
+            cache.put(question, hits, version, resp_text)
+        return resp_text
+    except Exception:
+        return _fallback(parts)
+
+
+async def agenerate_answer_with_llm(
+    llm_obj,
+    question: str,
+    hits: List[Any],
+    cache: AnswerCache = None,
+    version: str = None,
+) -> str:
+    # Same as generate_answer_with_llm, but the LLM request is awaited; cancelling
+    # the task (e.g. asyncio.wait_for timing out) aborts the request to Ollama
+    if cache is not None:
+        cached = cache.get(question, hits, version)
+        if cached is not None:
+            profile.count("answer.cache_hits")
+            return cached
+
+    parts, direct, prompt = _prepare(question, hits)
+    if direct is not None:
+        return direct
+
     try:
-        resp_text = _safe_llm_call(llm_obj, prompt).strip()
+        with profile.stage("answer.llm"):
+            resp_text = (await _safe_llm_acall(llm_obj, prompt)).strip()
+        profile.count("answer.chars", len(resp_text))
+        if cache is not None and not looks_like_gibberish(resp_text):
+            cache.put(question, hits, version, resp_text)
         return resp_text
     except Exception:
-        lines = [
-            f"• {p['path']} — {p['summary'] or p['excerpt'][:120]}"
-            for p in parts[:5]
-        ]
-        return "Here are the most relevant files:\n" + "\n".join(lines)
+        return _fallback(parts)
+
+
+def stream_answer_with_llm(
+    llm_obj,
+    question: str,
+    hits: List[Any],
+    cache: AnswerCache = None,
+    version: str = None,
+    max_tokens: int = LLM_MAX_TOKENS,
+) -> Iterator[str]:
+    # Yields the answer piece by piece; raises AnswerAborted (after closing the
+    # LLM stream) as soon as the partial answer looks like gibberish
+    if cache is not None:
+        cached = cache.get(question, hits, version)
+        if cached is not None:
+            profile.count("answer.cache_hits")
+            yield cached
+            return
+
+    parts, direct, prompt = _prepare(question, hits)
+    if direct is not None:
+        yield direct
+        return
+
+    text = ""
+    checked = 0
+    t = time.perf_counter()
+    stream = _safe_llm_stream(llm_obj, prompt, max_tokens=max_tokens)
+    try:
+        for piece in stream:
+            if not text:
+                profile.record("answer.first_token", t, time.perf_counter())
+                piece = piece.lstrip()
+            text += piece
+            if len(text) - checked >= GIBBERISH_CHECK_CHARS // 2:
+                checked = len(text)
+                if partial_gibberish(text, GIBBERISH_CHECK_CHARS):
+                    raise AnswerAborted("LLM output looks like gibberish")
+            yield piece
+    except AnswerAborted:
+        raise
+    except Exception:
+        if text:
+            raise
+        yield _fallback(parts)
+        return
+    finally:
+        stream.close()
+
+    profile.record("answer.stream", t, time.perf_counter())
+    profile.count("answer.chars", len(text))
+    text = text.strip()
+    if looks_like_gibberish(text):
+        raise AnswerAborted("LLM output looks like gibberish")
+    if cache is not None:
+        cache.put(question, hits, version, text)
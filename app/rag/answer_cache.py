@@ -0,0 +1,62 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from app.config import ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL
+from app.core.query_cache import normalize_query
+
+
+def hit_ids(hits: List[Any]) -> List[str]:
+    ids = []
+    for d, _ in hits:
+        meta = d.metadata or {}
+        ids.append(f"{meta.get('path', '')}#{meta.get('chunk_id', 0)}")
+    return ids
+
+
+# (question, retrieved chunks, index version) -> LLM answer, with TTL + LRU size cap
+class AnswerCache:
+
+    def __init__(self, size: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, question: str, hits: List[Any], version: str) -> str:
+        raw = "\x1f".join([normalize_query(question), version or "", *hit_ids(hits)])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, hits: List[Any], version: str) -> Optional[str]:
+        k = self.key(question, hits, version)
+        with self._lock:
+            entry = self._entries.get(k)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(k, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(k)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, question: str, hits: List[Any], version: str, answer: str):
+        k = self.key(question, hits, version)
+        with self._lock:
+            self._entries[k] = (time.monotonic() + self.ttl, answer)
+            self._entries.move_to_end(k)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+_answer_cache = None
+
+
+def get_answer_cache() -> AnswerCache:
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = AnswerCache()
+    return _answer_cache
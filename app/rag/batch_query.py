@@ -0,0 +1,238 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from app.config import (
+    BATCH_QUERY_SIZE,
+    BATCH_LLM_CONCURRENCY,
+    BATCH_LLM_TIMEOUT,
+    HYBRID_SEARCH,
+)
+from app.core.models import get_query_embeddings
+from app.indexing.loader import load_store
+from app.indexing.rowstore import thread_rows
+from app.indexing.txn import index_version
+from app.rag.answer import agenerate_answer_with_llm
+from app.rag.answer_cache import get_answer_cache
+from app.rag.batching import embed_queries, search_vectors
+from app.rag.federated import FederatedSearch, list_indexes
+from app.rag.llm import init_llm
+from app.rag.retrieval import hybrid_search
+from app.utils.misc import looks_like_gibberish
+from app.utils import profile
+
+
+def read_queries(path: Path) -> List[Dict]:
+    # One query per line: plain text, or JSON {"id": ..., "query": ...}
+    # A line that looks like JSON but isn't a query object is kept as plain text
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    item = json.loads(line)
+                    query = item["query"]
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"⚠️ Line {n}: not a JSON query object ({e!r}), using it as plain text")
+                else:
+                    if isinstance(query, str) and query.strip():
+                        out.append({**item, "id": item.get("id", n), "query": query})
+                    else:
+                        print(f"⚠️ Line {n}: empty or non-text \"query\", skipped")
+                    continue
+            out.append({"id": n, "query": line})
+    return out
+
+
+def _ms(t: float) -> float:
+    return round((time.perf_counter() - t) * 1000, 3)
+
+
+class _Searcher:
+    # Dense search for a whole batch at once (one embedding pass, one FAISS search),
+    # then BM25 + fusion per query
+
+    def __init__(self, name: str, mmap: bool, nprobe: int, ef_search: int):
+        db_dir = Path("vector_dbs") / f"{name}_bge_db"
+        self.embeddings = get_query_embeddings()
+        self.vectordb = load_store(db_dir, self.embeddings, mmap=mmap, nprobe=nprobe, ef_search=ef_search)
+        self.name = name
+        self.version = index_version(db_dir)
+
+    def search(self, queries: List[str], k: int) -> List[Dict]:
+        fetch = k * 2 if HYBRID_SEARCH else k
+        t = time.perf_counter()
+        x = embed_queries(self.vectordb, self.embeddings, queries)
+        embed_ms = _ms(t) / len(queries)
+
+        t = time.perf_counter()
+        with profile.stage("batch.dense"):
+            dense = search_vectors(self.vectordb, x, fetch)
+        dense_ms = _ms(t) / len(queries)
+
+        # search() runs in an executor thread
+        lexical = thread_rows(self.name).lexical
+        out = []
+        for q, rows in zip(queries, dense):
+            t = time.perf_counter()
+            hits = hybrid_search(
+                self.vectordb,
+                lexical,
+                q,
+                k=k,
+                dense_search=lambda _q, k, rows=rows: rows[:k],
+            )
+            out.append({
+                "hits": hits,
+                "timings": {
+                    "embed_ms": round(embed_ms, 3),
+                    "dense_ms": round(dense_ms, 3),
+                    "fuse_ms": _ms(t),
+                },
+            })
+        return out
+
+
+class _FederatedSearcher:
+    # Queries are embedded in one pass up front; FederatedSearch then hits the query cache
+
+    def __init__(self, names: List[str], mmap: bool, nprobe: int, ef_search: int):
+        self.embeddings = get_query_embeddings()
+        self.fed = FederatedSearch(names, self.embeddings, mmap=mmap, nprobe=nprobe, ef_search=ef_search)
+        self.version = self.fed.version()
+
+    def search(self, queries: List[str], k: int) -> List[Dict]:
+        t = time.perf_counter()
+        if hasattr(self.embeddings, "embed_queries"):
+            self.embeddings.embed_queries(queries)
+        embed_ms = _ms(t) / len(queries)
+
+        out = []
+        for q in queries:
+            t = time.perf_counter()
+            hits = self.fed.search(q, k=k)
+            out.append({"hits": hits, "timings": {"embed_ms": round(embed_ms, 3), "search_ms": _ms(t)}})
+        return out
+
+
+async def _answer(llm, slots, question: str, hits, answers, version: str):
+    async with slots:
+        t = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(
+                agenerate_answer_with_llm(llm, question, hits[:5], cache=answers, version=version),
+                BATCH_LLM_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            return None, _ms(t), "timeout"
+        if looks_like_gibberish(text):
+            return None, _ms(t), "gibberish"
+        return text, _ms(t), None
+
+
+def _record(item: Dict, res: Dict) -> Dict:
+    return {
+        **item,
+        "results": [
+            {
+                "path": d.metadata.get("path"),
+                "chunk_id": d.metadata.get("chunk_id", 0),
+                "type": d.metadata.get("type"),
+                "score": round(float(s), 4),
+            }
+            for d, s in res["hits"]
+        ],
+        "timings": res["timings"],
+    }
+
+
+async def _run(searcher, queries: List[Dict], out, k: int, answer: bool, concurrency: int, batch_size: int):
+    loop = asyncio.get_running_loop()
+    llm = init_llm() if answer else None
+    if answer and llm is None:
+        print("⚠️ LLM unavailable, writing search results only")
+    slots = asyncio.Semaphore(concurrency)
+    answers = get_answer_cache()
+
+    latencies = []
+    pending = None  # (records, answer tasks) of the previous batch, written in order
+
+    async def flush(batch):
+        records, tasks = batch
+        for rec, task in zip(records, tasks):
+            if task is not None:
+                text, ms, error = await task
+                rec["answer"] = text
+                rec["timings"]["answer_ms"] = ms
+                if error:
+                    rec["answer_error"] = error
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        out.flush()
+
+    for i in range(0, len(queries), batch_size):
+        chunk = queries[i:i+batch_size]
+        # Searching this batch overlaps with answering the previous one
+        t = time.perf_counter()
+        results = await loop.run_in_executor(None, searcher.search, [q["query"] for q in chunk], k)
+        latencies.append(_ms(t) / len(chunk))
+
+        records = [_record(item, res) for item, res in zip(chunk, results)]
+        tasks = [
+            asyncio.ensure_future(_answer(llm, slots, item["query"], res["hits"], answers, searcher.version))
+            if llm is not None and res["hits"] else None
+            for item, res in zip(chunk, results)
+        ]
+        if pending is not None:
+            await flush(pending)
+        pending = (records, tasks)
+        print(f"-> {min(i + batch_size, len(queries))}/{len(queries)} queries searched")
+
+    if pending is not None:
+        await flush(pending)
+    return latencies
+
+
+# Non-interactive mode: a file of queries in, one JSON line per query out
+def run_batch(
+    queries_path: str,
+    out_path: str,
+    name: str = None,
+    federated: List[str] = None,
+    k: int = 10,
+    answer: bool = False,
+    concurrency: int = BATCH_LLM_CONCURRENCY,
+    batch_size: int = BATCH_QUERY_SIZE,
+    mmap: bool = False,
+    nprobe: int = None,
+    ef_search: int = None,
+):
+    queries = read_queries(Path(queries_path))
+    if not queries:
+        print("❌ No queries found.")
+        return None
+
+    t0 = time.perf_counter()
+    if federated is not None:
+        searcher = _FederatedSearcher(federated or list_indexes(), mmap, nprobe, ef_search)
+    else:
+        searcher = _Searcher(name, mmap, nprobe, ef_search)
+    print(f"-> Index loaded in {time.perf_counter() - t0:.1f}s, {len(queries)} queries")
+
+    t = time.perf_counter()
+    with open(out_path, "w", encoding="utf-8") as out:
+        latencies = asyncio.run(_run(searcher, queries, out, k, answer, concurrency, batch_size))
+    secs = time.perf_counter() - t
+
+    if isinstance(searcher, _FederatedSearcher):
+        searcher.fed.close()
+    search_ms = sum(latencies) / len(latencies)
+    print(
+        f"✅ {len(queries)} queries in {secs:.1f}s ({len(queries) / secs:.1f}/s, "
+        f"search {search_ms:.1f} ms/query) → {out_path}"
+    )
+    return {"queries": len(queries), "seconds": secs, "queries_per_s": len(queries) / secs, "search_ms": search_ms}
@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config import QUERY_BATCH_WAIT_MS, QUERY_BATCH_MAX
+
+
+def embed_queries(vectordb, embeddings, texts: List[str]) -> np.ndarray:
+    # One forward pass for all texts, normalized like the store's own queries
+    if hasattr(embeddings, "embed_queries"):
+        vecs = embeddings.embed_queries(texts)
+    else:
+        vecs = embeddings.embed_documents(texts)
+    x = np.asarray(vecs, dtype="float32")
+    if getattr(vectordb, "_normalize_L2", False):
+        faiss.normalize_L2(x)
+    return x
+
+
+def _hits(store, row_s, row_i) -> List[Tuple[Document, float]]:
+    hits = []
+    for s, i in zip(row_s, row_i):
+        if i == -1:
+            continue
+        doc = store.docstore.search(store.index_to_docstore_id[int(i)])
+        if isinstance(doc, Document):
+            hits.append((doc, float(s)))
+    return hits
+
+
+def search_vectors(vectordb, x: np.ndarray, k: int) -> List[List[Tuple[Document, float]]]:
+    # One FAISS search for a whole batch of query vectors
+    scores, positions = vectordb.index.search(x, k)
+    return [_hits(vectordb, row_s, row_i) for row_s, row_i in zip(scores, positions)]
+
+
+# Micro-batching front for dense search: queries arriving within max_wait_ms (or up
+# to max_batch of them) share one embedding forward pass and one FAISS search
+class QueryBatcher:
+
+    def __init__(
+        self,
+        vectordb,
+        embeddings=None,
+        max_wait_ms: float = QUERY_BATCH_WAIT_MS,
+        max_batch: int = QUERY_BATCH_MAX,
+    ):
+        self.vectordb = vectordb
+        self.embeddings = embeddings or vectordb.embeddings
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.queries = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._thread.start()
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        # Same result shape as FAISS.similarity_search_with_score; blocks until the batch ran
+        fut = Future()
+        self._queue.put((query, k, fut))
+        return fut.result()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def avg_batch(self) -> float:
+        return self.queries / self.batches if self.batches else 0.0
+
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            stop = False
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch):
+        try:
+            x = embed_queries(self.vectordb, self.embeddings, [q for q, _, _ in batch])
+            k = max(k for _, k, _ in batch)
+            scores, positions = self.vectordb.index.search(x, k)
+        except Exception as e:
+            for _, _, fut in batch:
+                fut.set_exception(e)
+            return
+
+        self.batches += 1
+        self.queries += len(batch)
+
+        store = self.vectordb
+        for (_, k, fut), row_s, row_i in zip(batch, scores, positions):
+            try:
+                hits = _hits(store, row_s[:k], row_i[:k])
+            except Exception as e:
+                fut.set_exception(e)
+            else:
+                fut.set_result(hits)
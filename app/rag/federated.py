@@ -0,0 +1,204 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import faiss
+from langchain_core.documents import Document
+
+from app.config import FEDERATED_MAX_MB, FEDERATED_WORKERS, HYBRID_SEARCH
+from app.indexing.lexical import tokenize
+from app.indexing.loader import DOCS_FILE, load_store
+from app.indexing.rowstore import rows_path, thread_rows
+from app.indexing.txn import index_version
+from app.rag.retrieval import fuse
+from app.utils import profile
+
+DB_SUFFIX = "_bge_db"
+
+
+def list_indexes() -> List[str]:
+    # Every index built so far (vector_dbs/<name>_bge_db with its row store)
+    root = Path("vector_dbs")
+    if not root.exists():
+        return []
+    return sorted(
+        d.name[: -len(DB_SUFFIX)]
+        for d in root.iterdir()
+        if d.is_dir() and d.name.endswith(DB_SUFFIX) and rows_path(d.name[: -len(DB_SUFFIX)]).exists()
+    )
+
+
+class _Shard:
+    # One loaded index
+
+    def __init__(self, name: str, vectordb, mb: float):
+        self.name = name
+        self.vectordb = vectordb
+        self.mb = mb
+
+    def lexical(self):
+        return thread_rows(self.name).lexical
+
+
+# Searches several indexes at once: the query is embedded once, every index is
+# searched in a thread pool and the results are fused into one ranking.
+# Loaded indexes are kept in LRU order and the least recently used are dropped
+# once their combined size passes `max_mb`.
+class FederatedSearch:
+
+    def __init__(
+        self,
+        names: List[str],
+        embeddings,
+        mmap: bool = True,
+        nprobe: int = None,
+        ef_search: int = None,
+        max_mb: float = FEDERATED_MAX_MB,
+        workers: int = FEDERATED_WORKERS,
+    ):
+        self.names = list(names)
+        self.embeddings = embeddings
+        self.mmap = mmap
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.max_mb = max_mb
+        self.pool = ThreadPoolExecutor(max(1, min(workers, len(self.names))), thread_name_prefix="federated")
+        self.resident: "OrderedDict[str, _Shard]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.load_locks = {n: threading.Lock() for n in self.names}
+        self.loads = 0
+        self.evictions = 0
+
+        # Indexes are searched in parallel; one thread per FAISS search avoids oversubscription
+        if len(self.names) > 1:
+            faiss.omp_set_num_threads(1)
+
+    def _db_dir(self, name: str) -> Path:
+        return Path("vector_dbs") / f"{name}{DB_SUFFIX}"
+
+    def _size_mb(self, name: str) -> float:
+        # Files that end up in memory: the vectors, plus the docstore unless mmap
+        # (index.pkl for indexes saved before docs.sqlite replaced it)
+        db_dir = self._db_dir(name)
+        files = ["index.faiss"]
+        if not (self.mmap and (db_dir / DOCS_FILE).exists()):
+            files.append("index.pkl" if (db_dir / "index.pkl").exists() else DOCS_FILE)
+        return sum((db_dir / f).stat().st_size for f in files if (db_dir / f).exists()) / 2**20
+
+    def shard(self, name: str) -> _Shard:
+        with self.lock:
+            shard = self.resident.get(name)
+            if shard is not None:
+                self.resident.move_to_end(name)
+                return shard
+
+        # Loads of different indexes run concurrently; the same index loads once
+        with self.load_locks[name]:
+            with self.lock:
+                shard = self.resident.get(name)
+            if shard is None:
+                with profile.stage("federated.load"):
+                    vectordb = load_store(
+                        self._db_dir(name),
+                        self.embeddings,
+                        mmap=self.mmap,
+                        nprobe=self.nprobe,
+                        ef_search=self.ef_search,
+                    )
+                shard = _Shard(name, vectordb, self._size_mb(name))
+                with self.lock:
+                    self.resident[name] = shard
+                    self.loads += 1
+                    self._evict(keep=name)
+
+        with self.lock:
+            if name in self.resident:
+                self.resident.move_to_end(name)
+        return shard
+
+    def _evict(self, keep: str):
+        # Searches still holding an evicted shard finish with it; it is freed afterwards
+        while self.resident_mb() > self.max_mb and len(self.resident) > 1:
+            oldest = next(iter(self.resident))
+            if oldest == keep:
+                self.resident.move_to_end(oldest)
+                oldest = next(iter(self.resident))
+            self.resident.pop(oldest)
+            self.evictions += 1
+            profile.count("federated.evictions")
+
+    def resident_mb(self) -> float:
+        return sum(s.mb for s in self.resident.values())
+
+    def version(self) -> str:
+        # Answer cache key: changes when any of the indexes is rebuilt or synced
+        return "|".join(f"{n}:{index_version(self._db_dir(n))}" for n in self.names)
+
+    def _dense(self, name: str, vector: List[float], terms, k: int):
+        # The shard is resolved once here and reused by round 2 and resolve, so a
+        # query never reloads an index the LRU dropped mid-search
+        shard = self.shard(name)
+        with profile.stage("federated.dense"):
+            dense = shard.vectordb.similarity_search_with_score_by_vector(vector, k=k)
+        lex = shard.lexical()
+        n, avgdl = lex.stats()
+        return shard, dense, (n, avgdl, lex.doc_freqs(terms))
+
+    def _lexical(self, shard: _Shard, query: str, k: int, stats):
+        with profile.stage("federated.lexical"):
+            return [(*item, shard.name) for item in shard.lexical().search(query, k, stats=stats)]
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        min_score: float = 0.3,
+        hybrid: bool = HYBRID_SEARCH,
+    ) -> List[Tuple[Document, float]]:
+        # Same contract as hybrid_search, over all indexes
+        with profile.stage("federated.embed"):
+            vector = self.embeddings.embed_query(query)
+        terms = set(tokenize(query))
+        fetch = k * 2 if hybrid else k
+
+        # Round 1: dense top-k per index (L2 distances from the same model compare
+        # directly) and the BM25 statistics for the query terms
+        firsts = list(self.pool.map(lambda n: self._dense(n, vector, terms, fetch), self.names))
+        shards = {shard.name: shard for shard, _, _ in firsts}
+        dense = sorted(
+            ((d, s) for _, part, _ in firsts for d, s in part if s >= min_score),
+            key=lambda x: x[1],
+        )
+        if not hybrid:
+            return dense[:k]
+
+        # Round 2: BM25 with corpus-wide document counts and frequencies, so a
+        # term that is rare in one share but common overall is not overrated
+        n = sum(st[0] for _, _, st in firsts)
+        if not n:
+            return dense[:k]
+        avgdl = sum(st[0] * st[1] for _, _, st in firsts) / n
+        dfs: Dict[str, int] = {}
+        for _, _, (_, _, part) in firsts:
+            for term, df in part.items():
+                dfs[term] = dfs.get(term, 0) + df
+        stats = (n, avgdl, dfs)
+
+        parts = self.pool.map(lambda shard: self._lexical(shard, query, fetch, stats), shards.values())
+        lex = sorted((item for part in parts for item in part), key=lambda x: -x[3])[:fetch]
+        if not lex:
+            return dense[:k]
+
+        return fuse(dense[:fetch], lex, k, lambda item: shards[item[4]].vectordb.docstore.search(item[0]))
+
+    def report(self):
+        print(
+            f"🗂️ Federated: {len(self.names)} indexes, {len(self.resident)} resident "
+            f"({self.resident_mb():.0f} / {self.max_mb:.0f} MB), "
+            f"{self.loads} loads, {self.evictions} evictions"
+        )
+
+    def close(self):
+        self.pool.shutdown(wait=False)
@@ -1,6 +1,11 @@
+import asyncio
 import time
+from typing import Iterator
+
 from langchain_community.llms import Ollama
 
+from app.config import LLM_MAX_TOKENS
+
 _global_llm = None
 _llm_initialized_at = None
 
@@ -14,7 +19,7 @@ def init_llm():
 
     try:
         print("→ Attempting to initialize Ollama LLM (tinyllama:1.1b)...")
-        _global_llm = Ollama(model="tinyllama:1.1b")
+        _global_llm = Ollama(model="tinyllama:1.1b", num_predict=LLM_MAX_TOKENS)
         _llm_initialized_at = time.time()
         print("Ollama initialized.")
         return _global_llm
@@ -42,3 +47,46 @@ def _safe_llm_call(llm_obj, prompt: str) -> str:
         return resp["text"]
 
     return str(resp)
+
+
+async def _safe_llm_acall(llm_obj, prompt: str) -> str:
+
+    if llm_obj is None:
+        raise RuntimeError("LLM not available")
+
+    if not hasattr(llm_obj, "ainvoke"):
+        return await asyncio.to_thread(_safe_llm_call, llm_obj, prompt)
+    return _text_of(await llm_obj.ainvoke(prompt))
+
+
+def _text_of(chunk) -> str:
+    if isinstance(chunk, str):
+        return chunk
+    if hasattr(chunk, "text"):
+        return chunk.text
+    if hasattr(chunk, "content"):
+        return chunk.content
+    return str(chunk)
+
+
+def _safe_llm_stream(llm_obj, prompt: str, max_tokens: int = LLM_MAX_TOKENS) -> Iterator[str]:
+    # Yields pieces as the model produces them. Closing the generator closes the
+    # HTTP stream, which stops Ollama generating.
+    if llm_obj is None:
+        raise RuntimeError("LLM not available")
+
+    if not hasattr(llm_obj, "stream"):
+        yield _safe_llm_call(llm_obj, prompt)
+        return
+
+    stream = llm_obj.stream(prompt)
+    try:
+        # Ollama streams one token per chunk; num_predict caps it server-side as well
+        for n, chunk in enumerate(stream, 1):
+            yield _text_of(chunk)
+            if n >= max_tokens:
+                break
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
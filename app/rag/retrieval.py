@@ -0,0 +1,64 @@
+from typing import Any, Callable, Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+from app.config import HYBRID_SEARCH, RRF_K
+from app.utils import profile
+
+
+def _key(doc: Document) -> Tuple[str, int]:
+    return doc.metadata.get("path"), doc.metadata.get("chunk_id", 0)
+
+
+# Dense + BM25 retrieval fused with reciprocal rank fusion
+def hybrid_search(
+    vectordb,
+    lexical,
+    query: str,
+    k: int = 10,
+    min_score: float = 0.3,
+    hybrid: bool = HYBRID_SEARCH,
+    dense_search: Callable = None,
+) -> List[Tuple[Document, float]]:
+    # dense_search(query, k) replaces the store's own search (e.g. a QueryBatcher)
+    dense_search = dense_search or vectordb.similarity_search_with_score
+    with profile.stage("search.dense"):
+        dense = dense_search(query, k=k * 2 if hybrid else k)
+    dense = [(d, s) for d, s in dense if s >= min_score]
+
+    with profile.stage("search.lexical"):
+        lex = lexical.search(query, k * 2) if hybrid and lexical is not None else []
+    if not lex:
+        return dense[:k]
+
+    return fuse(dense, lex, k, lambda item: vectordb.docstore.search(item[0]))
+
+
+def fuse(
+    dense: List[Tuple[Document, float]],
+    lex: List[Tuple],
+    k: int,
+    resolve: Callable[[Tuple], Any],
+) -> List[Tuple[Document, float]]:
+    # lex items start with (docstore id, path, chunk_id, ...); resolve(item) loads
+    # the Document for lexical-only hits
+    # score = sum of 1 / (RRF_K + rank) over both rankings, scaled so 1.0 = top of both
+    fused: Dict[Tuple[str, int], float] = {}
+    docs: Dict[Tuple[str, int], Any] = {}
+    for rank, (d, _) in enumerate(dense):
+        key = _key(d)
+        docs[key] = d
+        fused[key] = fused.get(key, 0.0) + 1 / (RRF_K + rank + 1)
+
+    for rank, item in enumerate(lex):
+        key = (item[1], item[2])
+        if key not in docs:
+            d = resolve(item)
+            if not isinstance(d, Document):
+                continue
+            docs[key] = d
+        fused[key] = fused.get(key, 0.0) + 1 / (RRF_K + rank + 1)
+
+    best = 2 / (RRF_K + 1)
+    ranked = sorted(fused.items(), key=lambda x: -x[1])[:k]
+    return [(docs[key], score / best) for key, score in ranked]
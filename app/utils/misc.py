@@ -21,3 +21,10 @@ def looks_like_gibberish(text: str) -> bool:
         return True
 
     return False
+
+
+def partial_gibberish(text: str, min_chars: int = 80) -> bool:
+    # Same checks on a streaming answer, once there is enough text to judge
+    if len((text or "").strip()) < min_chars:
+        return False
+    return looks_like_gibberish(text)
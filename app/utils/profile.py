@@ -0,0 +1,197 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+from app.config import PROFILE_MAX_EVENTS
+from app.utils.timing import rss_mb
+
+# Per-stage profiling: timers, counters and memory snapshots.
+# Everything is a no-op (one bool check) until enable() is called.
+
+_enabled = False
+_lock = threading.Lock()
+_T0 = time.perf_counter()
+_NULL = nullcontext()
+
+# stage -> [calls, total s, max s, peak rss MB]
+_stages: Dict[str, List[float]] = {}
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_events: List[Dict] = []
+
+
+def enable(trace: str = None, prom: str = None):
+    # trace / prom: files written at exit (JSON trace, Prometheus text)
+    global _enabled
+    _enabled = True
+    if trace or prom:
+        atexit.register(_dump, trace, prom)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+@contextmanager
+def _stage(name: str):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        record(name, t, end)
+
+
+def record(name: str, start: float, end: float):
+    # A stage timed by the caller (perf_counter() start / end)
+    if not _enabled:
+        return
+    secs = end - start
+    mem = rss_mb()
+    with _lock:
+        s = _stages.get(name)
+        if s is None:
+            s = _stages[name] = [0, 0.0, 0.0, 0.0]
+        s[0] += 1
+        s[1] += secs
+        s[2] = max(s[2], secs)
+        s[3] = max(s[3], mem)
+        if len(_events) < PROFILE_MAX_EVENTS:
+            # Chrome trace "complete" event (chrome://tracing, Perfetto)
+            _events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start - _T0) * 1e6,
+                "dur": secs * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {"rss_mb": round(mem, 1)},
+            })
+
+
+def stage(name: str):
+    # with stage("build.embed"): ...
+    return _stage(name) if _enabled else _NULL
+
+
+def timed_iter(name: str, items: Iterable) -> Iterable:
+    # Times each next() on `items` (work done by a lazy producer) under `name`
+    return _timed_iter(name, items) if _enabled else items
+
+
+def _timed_iter(name: str, items: Iterable) -> Iterator:
+    it = iter(items)
+    while True:
+        t = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            record(name, t, time.perf_counter())
+            return
+        record(name, t, time.perf_counter())
+        yield item
+
+
+def count(name: str, n: float = 1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def gauge(name: str, value: float):
+    if not _enabled:
+        return
+    with _lock:
+        _gauges[name] = value
+
+
+def snapshot(label: str):
+    # Resident memory at a point in the run, e.g. snapshot("build.after_save")
+    if _enabled:
+        gauge(f"{label}.rss_mb", rss_mb())
+
+
+def summary() -> Dict:
+    with _lock:
+        return {
+            "stages": {
+                k: {
+                    "calls": int(v[0]),
+                    "seconds": round(v[1], 6),
+                    "mean_ms": round(v[1] / v[0] * 1000, 3) if v[0] else 0.0,
+                    "max_ms": round(v[2] * 1000, 3),
+                    "peak_rss_mb": round(v[3], 1),
+                }
+                for k, v in _stages.items()
+            },
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+        }
+
+
+def _metric_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def prometheus_text() -> str:
+    snap = summary()
+    lines = [
+        "# HELP intellisearch_stage_seconds_total Time spent per stage",
+        "# TYPE intellisearch_stage_seconds_total counter",
+    ]
+    lines += [f'intellisearch_stage_seconds_total{{stage="{k}"}} {v["seconds"]}' for k, v in snap["stages"].items()]
+    lines += [
+        "# HELP intellisearch_stage_calls_total Completed calls per stage",
+        "# TYPE intellisearch_stage_calls_total counter",
+    ]
+    lines += [f'intellisearch_stage_calls_total{{stage="{k}"}} {v["calls"]}' for k, v in snap["stages"].items()]
+    lines += [
+        "# HELP intellisearch_stage_peak_rss_mb Highest resident memory seen at the end of a stage",
+        "# TYPE intellisearch_stage_peak_rss_mb gauge",
+    ]
+    lines += [f'intellisearch_stage_peak_rss_mb{{stage="{k}"}} {v["peak_rss_mb"]}' for k, v in snap["stages"].items()]
+    for k, v in sorted(snap["counters"].items()):
+        name = f"intellisearch_{_metric_name(k)}_total"
+        lines += [f"# TYPE {name} counter", f"{name} {v}"]
+    for k, v in sorted(snap["gauges"].items()):
+        name = f"intellisearch_{_metric_name(k)}"
+        lines += [f"# TYPE {name} gauge", f"{name} {v}"]
+    lines += ["# TYPE intellisearch_rss_mb gauge", f"intellisearch_rss_mb {rss_mb():.1f}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_trace(path: str):
+    with _lock:
+        events = list(_events)
+    data = {"traceEvents": events, "displayTimeUnit": "ms", "summary": summary()}
+    Path(path).write_text(json.dumps(data))
+
+
+def report():
+    snap = summary()
+    if not snap["stages"] and not snap["counters"]:
+        return
+    print("⏱️ Profile:")
+    for k, v in sorted(snap["stages"].items(), key=lambda x: -x[1]["seconds"]):
+        print(
+            f"   {k:<28} {v['seconds']:9.2f}s  {v['calls']:>7} calls  "
+            f"{v['mean_ms']:9.2f} ms avg  {v['peak_rss_mb']:7.0f} MB"
+        )
+    for k, v in sorted(snap["counters"].items()):
+        print(f"   {k:<28} {v:>12g}")
+
+
+def _dump(trace: str, prom: str):
+    report()
+    if trace:
+        write_trace(trace)
+        print(f"-> Profile trace written to {trace}")
+    if prom:
+        Path(prom).write_text(prometheus_text())
+        print(f"-> Metrics written to {prom}")
@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+_T0 = time.perf_counter()
+_marks: List[Tuple[str, float]] = []
+
+
+@contextmanager
+def timed(label: str):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        _marks.append((label, time.perf_counter() - t))
+
+
+def rss_mb() -> float:
+    # Current resident set size (falls back to peak RSS where /proc is missing)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except Exception:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except Exception:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return 0.0
+
+
+def startup_report():
+    print("⏱️ Startup timing:")
+    for label, secs in _marks:
+        print(f"   {label:<28} {secs:7.2f}s")
+    print(f"   {'total since start':<28} {time.perf_counter() - _T0:7.2f}s")
+    print(f"   {'resident memory':<28} {rss_mb():7.0f} MB")
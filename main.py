@@ -6,27 +6,65 @@ Behavior: IDENTICAL
 
 import os
 import sys
-import json
 import argparse
 from pathlib import Path
 
+from app.utils.timing import timed, startup_report
 from app.core.device import log_device
-from app.core.models import load_embeddings
+from app.core.models import LazyEmbeddings
 from app.indexing.builder import build_index
 from app.indexing.delta import DeltaIndexer
-from app.chat.cli import chat
+from app.indexing.watch import watch
+from app.indexing.rowstore import has_rows
+from app.chat.cli import chat, chat_federated
+from app.rag.batch_query import run_batch
 from app.chat.gui import launch_gui
-from app.config import SUPPORTED_TEXT, SUPPORTED_IMG
+from app.indexing.ann import INDEX_TYPES, ENCODINGS
+from app.core.backends import BACKENDS, check_backend
+from app.indexing.parallel import extract_chunks
+from app.utils import profile
+from app import config
+from app.config import SUPPORTED_TEXT, ANN_INDEX, ANN_ENCODING, ANN_PCA_DIM, ANN_RESCORE
+
+
+# Backend check: accuracy / throughput of --backend against fp32 on chunks from the folder
+def run_backend_check(folder_arg: str, backend: str, n_texts: int = 256):
+    texts = []
+    for r, _, fns in os.walk(Path(folder_arg).expanduser()):
+        for fn in fns:
+            if Path(fn).suffix.lower().lstrip(".") in SUPPORTED_TEXT:
+                texts += extract_chunks(Path(r) / fn)
+            if len(texts) >= n_texts:
+                break
+        if len(texts) >= n_texts:
+            break
+
+    texts = texts[:n_texts]
+    if not texts:
+        print("❌ No text found to check the backend on.")
+        sys.exit(1)
+
+    queries = [" ".join(t.split()[:12]) for t in texts[::8]]
+    check_backend(backend, texts, queries)
 
 # Start MENU
-def run_menu(folder_arg: str):
+def run_menu(
+    folder_arg: str,
+    workers: int = None,
+    index_type: str = None,
+    nprobe: int = None,
+    ef_search: int = None,
+    mmap: bool = False,
+    encoding: str = None,
+    pca_dim: int = None,
+    rescore: bool = False,
+):
     folder = Path(folder_arg).expanduser()
     if not folder.exists():
         print(f"❌ Folder does not exist: {folder}")
         sys.exit(1)
 
     name = folder.name
-    embeddings = load_embeddings()
 
     print(f"\nRunning on folder: {folder}")
     print(f"Index name: '{name}'\n")
@@ -36,6 +74,7 @@ def run_menu(folder_arg: str):
     print("2. Chat (CLI)")
     print("3. Watchdog")
     print("4. Chat (GUI)")
+    print("5. Watch (live)")
     print("q. Quit")
 
     choice = input("> ").strip().lower()
@@ -48,121 +87,82 @@ def run_menu(folder_arg: str):
     # 1. Full Index Build
     if choice == "1":
         print(f"-> Building index for '{name}' …")
-        build_index(str(folder), name)
+        build_index(
+            str(folder),
+            name,
+            workers=workers,
+            index_type=index_type or ANN_INDEX,
+            encoding=encoding or ANN_ENCODING,
+            pca_dim=ANN_PCA_DIM if pca_dim is None else pca_dim,
+            rescore=rescore or ANN_RESCORE,
+        )
         sys.exit(0)
 
 
     # 2. CLI Chat
     elif choice == "2":
         db_dir = Path("vector_dbs") / f"{name}_bge_db"
-        idx_json = Path("file_indexes", f"{name}.json")
 
-        if not db_dir.exists() or not idx_json.exists():
+        if not db_dir.exists() or not has_rows(name):
             print("Index not found. Run Index mode first.")
             sys.exit(1)
 
         print("-> Starting CLI chat")
-        chat(name, embeddings_obj=embeddings)
+        chat(name, nprobe=nprobe, ef_search=ef_search, mmap=mmap)
         sys.exit(0)
 
    
     # 3. Watchdog/Delta Sync
     elif choice == "3":
         db_dir = Path("vector_dbs") / f"{name}_bge_db"
-        idx_json = Path("file_indexes", f"{name}.json")
 
-        if not db_dir.exists() or not idx_json.exists():
+        if not db_dir.exists() or not has_rows(name):
             print("No index found. Run Index first.")
             sys.exit(1)
 
-        rows = json.loads(idx_json.read_text())
-        handler = DeltaIndexer(str(folder), name, embeddings, db_dir, rows)
-
-        curr = {}
-        for r, _, fns in os.walk(folder):
-            for fn in fns:
-                ext = Path(fn).suffix.lower().lstrip(".")
-                if ext in SUPPORTED_TEXT or ext in SUPPORTED_IMG:
-                    p = Path(r) / fn
-                    try:
-                        stat = p.stat()
-                        curr[str(p)] = (stat.st_size, int(stat.st_mtime))
-                    except Exception:
-                        curr[str(p)] = (0, 0)
-
-        idx_map = {
-            r["path"]: (r.get("size", 0), r.get("mtime", 0))
-            for r in rows
-            if r.get("chunk_id", 0) == 0
-        }
-
-        to_add = set(curr) - set(idx_map)
-        to_delete = set(idx_map) - set(curr)
-        to_mod = {p for p in (set(curr) & set(idx_map)) if curr[p] != idx_map[p]}
-
-        for p in sorted(to_delete):
-            print(f"-> Removing {p}")
-            handler._remove_path(Path(p))
-
-        for p in sorted(to_mod):
-            print(f"-> Re-indexing {p}")
-            handler._remove_path(Path(p))
-            handler._index_path(Path(p))
-
-        for p in sorted(to_add):
-            print(f"-> Adding {p}")
-            handler._index_path(Path(p))
+        with timed("load index"):
+            handler = DeltaIndexer(str(folder), name, LazyEmbeddings(), db_dir)
+
+        handler.sync(verbose=True)
 
         print("✅ Delta sync complete.")
+        startup_report()
         sys.exit(0)
 
     
     # 4. GUI Chat (with auto-sync : Runs Watchdog to Check for Modified Files and Update Index)
     elif choice == "4":
         db_dir = Path("vector_dbs") / f"{name}_bge_db"
-        idx_json = Path("file_indexes", f"{name}.json")
 
-        if not db_dir.exists() or not idx_json.exists():
+        if not db_dir.exists() or not has_rows(name):
             print("Index not found.Run Index mode first.")
             sys.exit(1)
 
         print("Running watchdog sync before GUI launch...")
 
-        rows = json.loads(idx_json.read_text())
-        handler = DeltaIndexer(str(folder), name, embeddings, db_dir, rows)
-
-        curr = {}
-        for r, _, fns in os.walk(folder):
-            for fn in fns:
-                ext = Path(fn).suffix.lower().lstrip(".")
-                if ext in SUPPORTED_TEXT or ext in SUPPORTED_IMG:
-                    p = Path(r) / fn
-                    try:
-                        stat = p.stat()
-                        curr[str(p)] = (stat.st_size, int(stat.st_mtime))
-                    except Exception:
-                        curr[str(p)] = (0, 0)
-
-        idx_map = {
-            r["path"]: (r.get("size", 0), r.get("mtime", 0))
-            for r in rows
-            if r.get("chunk_id", 0) == 0
-        }
-
-        to_add = set(curr) - set(idx_map)
-        to_delete = set(idx_map) - set(curr)
-        to_mod = {p for p in (set(curr) & set(idx_map)) if curr[p] != idx_map[p]}
-
-        for p in sorted(to_delete):
-            handler._remove_path(Path(p))
-        for p in sorted(to_mod):
-            handler._remove_path(Path(p))
-            handler._index_path(Path(p))
-        for p in sorted(to_add):
-            handler._index_path(Path(p))
+        with timed("load index"):
+            handler = DeltaIndexer(str(folder), name, LazyEmbeddings(), db_dir)
+
+        handler.sync()
 
         print("-> Launching GUI")
-        launch_gui(name)
+        launch_gui(name, nprobe=nprobe, ef_search=ef_search, mmap=mmap)
+        sys.exit(0)
+
+
+    # 5. Live Watch (filesystem events, no rescans)
+    elif choice == "5":
+        db_dir = Path("vector_dbs") / f"{name}_bge_db"
+
+        if not db_dir.exists() or not has_rows(name):
+            print("No index found. Run Index first.")
+            sys.exit(1)
+
+        with timed("load index"):
+            handler = DeltaIndexer(str(folder), name, LazyEmbeddings(), db_dir)
+
+        startup_report()
+        watch(str(folder), handler)
         sys.exit(0)
 
     else:
@@ -179,8 +179,163 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "folder",
+        nargs="?",
         help="Folder to operate on (index name derived from folder name)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Extraction worker processes for Index mode (1 = serial)",
+    )
+    parser.add_argument(
+        "--index-type",
+        choices=INDEX_TYPES,
+        default=None,
+        help=f"Vector index built by Index mode (default: {ANN_INDEX})",
+    )
+    parser.add_argument(
+        "--encoding",
+        choices=ENCODINGS,
+        default=None,
+        help=f"Vector encoding for Index mode (default: {ANN_ENCODING}); prints a memory vs recall table",
+    )
+    parser.add_argument(
+        "--pca",
+        type=int,
+        default=None,
+        help="Index mode: reduce vectors to this many dimensions with PCA",
+    )
+    parser.add_argument(
+        "--rescore",
+        action="store_true",
+        help="Index mode: keep full vectors to re-score the top candidates exactly",
+    )
+    parser.add_argument(
+        "--nprobe",
+        type=int,
+        default=None,
+        help="IVF lists probed per query in chat modes",
+    )
+    parser.add_argument(
+        "--ef-search",
+        type=int,
+        default=None,
+        help="HNSW search breadth per query in chat modes",
+    )
+    parser.add_argument(
+        "--mmap",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help=f"Chat modes: memory-map the index read-only instead of loading it (default: off; FEDERATED_MMAP={config.FEDERATED_MMAP} with --federated)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=None,
+        help=f"CPU inference backend for all models (default: {config.INFER_BACKEND})",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=config.PROFILE,
+        help=f"Time each stage and write {config.PROFILE_TRACE} (Chrome trace JSON) and {config.PROFILE_PROM} (Prometheus text) on exit",
+    )
+    parser.add_argument(
+        "--federated",
+        nargs="*",
+        metavar="INDEX",
+        default=None,
+        help="Chat (CLI) across several indexes at once (default: every built index); no folder needed",
+    )
+    parser.add_argument(
+        "--queries",
+        metavar="FILE",
+        default=None,
+        help="Run every query in FILE (one per line, or JSON lines with \"query\") without the menu and exit",
+    )
+    parser.add_argument(
+        "--out",
+        default="results.jsonl",
+        help="--queries: JSON lines output (paths, scores, timings per query)",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=10,
+        help="--queries: results kept per query",
+    )
+    parser.add_argument(
+        "--answer",
+        action="store_true",
+        help="--queries: also answer each query with the LLM",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=config.BATCH_LLM_CONCURRENCY,
+        help="--queries --answer: LLM requests in flight",
+    )
+    parser.add_argument(
+        "--check-backend",
+        action="store_true",
+        help="Compare --backend with fp32 torch on text from the folder and exit",
+    )
 
     args = parser.parse_args()
-    run_menu(args.folder)
+    if args.profile:
+        profile.enable(trace=config.PROFILE_TRACE, prom=config.PROFILE_PROM)
+    if args.backend:
+        config.INFER_BACKEND = args.backend
+    if args.mmap is None:
+        args.mmap = args.federated is not None and config.FEDERATED_MMAP
+    if (args.index_type or ANN_INDEX) == "ivfpq" and args.encoding not in (None, "pq"):
+        parser.error(f"--index-type ivfpq is IVF with PQ codes; use --index-type ivf --encoding {args.encoding}")
+    if args.queries:
+        if args.federated is None:
+            if not args.folder:
+                parser.error("folder is required (or --federated)")
+            name = Path(args.folder).expanduser().name
+            if not (Path("vector_dbs") / f"{name}_bge_db").exists() or not has_rows(name):
+                print("Index not found. Run Index mode first.")
+                sys.exit(1)
+        else:
+            name = None
+        run_batch(
+            args.queries,
+            args.out,
+            name=name,
+            federated=args.federated,
+            k=args.top_k,
+            answer=args.answer,
+            concurrency=args.concurrency,
+            mmap=args.mmap,
+            nprobe=args.nprobe,
+            ef_search=args.ef_search,
+        )
+        sys.exit(0)
+    if args.federated is not None:
+        chat_federated(
+            args.federated,
+            nprobe=args.nprobe,
+            ef_search=args.ef_search,
+            mmap=args.mmap,
+        )
+        sys.exit(0)
+    if not args.folder:
+        parser.error("folder is required (except with --federated)")
+    if args.check_backend:
+        run_backend_check(args.folder, config.INFER_BACKEND)
+        sys.exit(0)
+
+    run_menu(
+        args.folder,
+        workers=args.workers,
+        index_type=args.index_type,
+        nprobe=args.nprobe,
+        ef_search=args.ef_search,
+        mmap=args.mmap,
+        encoding=args.encoding,
+        pca_dim=args.pca,
+        rescore=args.rescore,
+    )
@@ -1,9 +1,138 @@
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
 import shutil
+import threading
+import time
 
-app = FastAPI()
+import faiss
+
+from app.config import (
+    WEB_INDEX,
+    WEB_MMAP,
+    WEB_SEARCH_WORKERS,
+    WEB_LLM_CONCURRENCY,
+    WEB_LLM_TIMEOUT,
+    WEB_TOP_K,
+    QUERY_BATCH,
+    PROFILE,
+)
+from app.core.models import get_query_embeddings, loaded_models
+from app.indexing.loader import load_store
+from app.indexing.rowstore import rows_path, thread_rows
+from app.indexing.txn import index_version
+from app.rag.answer import agenerate_answer_with_llm
+from app.rag.answer_cache import get_answer_cache
+from app.rag.batching import QueryBatcher
+from app.rag.llm import init_llm
+from app.rag.retrieval import hybrid_search
+from app.utils.misc import looks_like_gibberish
+from app.utils import profile
+
+
+# Rolling latency window per stage (ms)
+class _Latency:
+
+    def __init__(self, size: int = 1000):
+        self.samples = {}
+        # stage -> [requests, total ms] since startup (Prometheus _count / _sum)
+        self.totals = {}
+        self.size = size
+        self.lock = threading.Lock()
+
+    def add(self, stage: str, ms: float):
+        with self.lock:
+            self.samples.setdefault(stage, deque(maxlen=self.size)).append(ms)
+            t = self.totals.setdefault(stage, [0, 0.0])
+            t[0] += 1
+            t[1] += ms
+
+    def summary(self):
+        with self.lock:
+            snap = {k: sorted(v) for k, v in self.samples.items()}
+            totals = {k: list(v) for k, v in self.totals.items()}
+        return {
+            k: {
+                "count": len(v),
+                "p50_ms": round(v[len(v) // 2], 1),
+                "p95_ms": round(v[min(len(v) - 1, int(len(v) * 0.95))], 1),
+                "total": totals[k][0],
+                "sum_ms": round(totals[k][1], 1),
+            }
+            for k, v in snap.items() if v
+        }
+
+
+# Loaded once at startup; embedding + search run in `pool`, never on the event loop
+class _Service:
+
+    def __init__(self):
+        self.name = WEB_INDEX
+        self.vectordb = None
+        self.batcher = None
+        self.version = None
+        self.llm = None
+        self.error = None
+        self.pool = ThreadPoolExecutor(WEB_SEARCH_WORKERS, thread_name_prefix="search")
+        self.llm_slots = None
+        self.answers = get_answer_cache()
+        self.latency = _Latency()
+        self.in_flight = 0
+
+    def load(self):
+        if not self.name:
+            self.error = "INTELLISEARCH_INDEX is not set"
+            return
+
+        db_dir = Path("vector_dbs") / f"{self.name}_bge_db"
+        if not db_dir.exists() or not rows_path(self.name).exists():
+            self.error = f"Index '{self.name}' not found. Run index mode first."
+            return
+
+        # Requests already run in parallel; one thread per FAISS search avoids oversubscription
+        faiss.omp_set_num_threads(1)
+
+        t = time.perf_counter()
+        self.vectordb = load_store(db_dir, get_query_embeddings(), mmap=WEB_MMAP)
+        self.latency.add("load_index", (time.perf_counter() - t) * 1000)
+        if QUERY_BATCH:
+            self.batcher = QueryBatcher(self.vectordb)
+        self.version = index_version(db_dir)
+        self.llm = init_llm()
+
+    def search(self, question: str):
+        t = time.perf_counter()
+        hits = hybrid_search(
+            self.vectordb,
+            thread_rows(self.name).lexical,
+            question,
+            k=WEB_TOP_K,
+            dense_search=self.batcher.search if self.batcher else None,
+        )
+        self.latency.add("search", (time.perf_counter() - t) * 1000)
+        return hits
+
+
+service = _Service()
+if PROFILE:
+    profile.enable()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    service.llm_slots = asyncio.Semaphore(WEB_LLM_CONCURRENCY)
+    await asyncio.get_running_loop().run_in_executor(service.pool, service.load)
+    yield
+    if service.batcher is not None:
+        service.batcher.close()
+    service.pool.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan)
 
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
@@ -44,19 +173,101 @@ async def upload_file(file: UploadFile = File(...)):
 def list_documents():
     return {"documents": [f.name for f in UPLOAD_DIR.iterdir()]}
 
+async def _answer(question: str, hits):
+    async with service.llm_slots:
+        return await agenerate_answer_with_llm(
+            service.llm, question, hits, cache=service.answers, version=service.version
+        )
+
+
 @app.post("/ask")
-def ask_question(question: str = Form(...)):
-    # TODO: call your retrieval logic here
-    return {
-        "question": question,
-        "answer": "Temporary answer placeholder",
-        "source": "Temporary source"
-    }
+async def ask_question(question: str = Form(...)):
+    if service.vectordb is None:
+        raise HTTPException(503, service.error or "Index is still loading")
+
+    t0 = time.perf_counter()
+    service.in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        hits = await loop.run_in_executor(service.pool, service.search, question)
+        sources = [
+            {"path": d.metadata.get("path"), "score": round(float(s), 3)}
+            for d, s in hits
+        ]
+        if not hits:
+            return {"question": question, "answer": "No relevant files found.", "source": None, "sources": []}
+
+        answer = None
+        if service.llm is not None:
+            # Waiting for an LLM slot counts against the timeout as well
+            t = time.perf_counter()
+            try:
+                answer = await asyncio.wait_for(_answer(question, hits), WEB_LLM_TIMEOUT)
+                if looks_like_gibberish(answer):
+                    answer = None
+            except asyncio.TimeoutError:
+                service.latency.add("llm_timeout", WEB_LLM_TIMEOUT * 1000)
+            else:
+                service.latency.add("llm", (time.perf_counter() - t) * 1000)
+
+        if answer is None:
+            answer = "Here are the most relevant files:\n" + "\n".join(
+                f"• {s['path']}" for s in sources
+            )
+
+        return {
+            "question": question,
+            "answer": answer,
+            "source": sources[0]["path"],
+            "sources": sources,
+        }
+    finally:
+        service.in_flight -= 1
+        service.latency.add("ask", (time.perf_counter() - t0) * 1000)
 
 @app.get("/status")
 def status():
+    store = service.vectordb
+    embeddings = store.embeddings if store is not None else None
     return {
         "backend": "OK",
-        "database": "Not connected yet",
-        "llm": "Disabled"
+        "database": {
+            "index": service.name or None,
+            "loaded": store is not None,
+            "error": service.error,
+            "version": service.version,
+            "vectors": store.index.ntotal if store is not None else 0,
+            "index_type": type(faiss.downcast_index(store.index)).__name__ if store is not None else None,
+            "mmap": WEB_MMAP,
+        },
+        "llm": getattr(service.llm, "model", None) or "Disabled",
+        "models": loaded_models(),
+        "requests_in_flight": service.in_flight,
+        "search_workers": WEB_SEARCH_WORKERS,
+        "query_batches": {
+            "batches": service.batcher.batches,
+            "avg_batch_size": round(service.batcher.avg_batch(), 2),
+        } if service.batcher is not None else None,
+        "latency": service.latency.summary(),
+        "query_cache_hit_rate": round(embeddings.hit_rate(), 3) if hasattr(embeddings, "hit_rate") else None,
+        "answer_cache": {"hits": service.answers.hits, "misses": service.answers.misses},
     }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text format; stage timers are only filled with INTELLISEARCH_PROFILE=1
+    lat = service.latency.summary()
+    lines = [profile.prometheus_text().rstrip("\n")]
+    lines += ["# TYPE intellisearch_requests_in_flight gauge", f"intellisearch_requests_in_flight {service.in_flight}"]
+    # Quantiles over the last 1000 requests per stage, _count / _sum since startup
+    lines += ["# TYPE intellisearch_latency_ms summary"]
+    for stage, v in lat.items():
+        for q in ("p50", "p95"):
+            lines.append(f'intellisearch_latency_ms{{stage="{stage}",quantile="0.{q[1:]}"}} {v[q + "_ms"]}')
+        lines.append(f'intellisearch_latency_ms_sum{{stage="{stage}"}} {v["sum_ms"]}')
+        lines.append(f'intellisearch_latency_ms_count{{stage="{stage}"}} {v["total"]}')
+    # Not intellisearch_answer_cache_*: profile already exports those from its counters
+    lines += ["# TYPE intellisearch_web_answer_cache_hits_total counter", f"intellisearch_web_answer_cache_hits_total {service.answers.hits}"]
+    lines += ["# TYPE intellisearch_web_answer_cache_misses_total counter", f"intellisearch_web_answer_cache_misses_total {service.answers.misses}"]
+    return "\n".join(lines) + "\n"